@@ -1,12 +1,54 @@
 import streamlit as st
 import os
 import json
+import hashlib
+import shutil
 import tempfile
+import threading
 import time
+import uuid
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
 
-from src.workflows import ResearchAssistantFlow
+if TYPE_CHECKING:
+    from src.memory import ZepMemoryLayer
+    from src.rag import RAGPipeline
+    from src.workflows import ResearchAssistantFlow
+    from src.workflows.flow import ResponseStream
+
+load_dotenv()
+
+try:
+    import orjson
+
+    def _pretty_json(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def _pretty_json(obj: Any) -> str:
+        return json.dumps(obj, indent=2)
+
+# Maximum number of (query, response) turns kept in the session
+HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", "50"))
+
+# Turns rendered on every rerun; older ones are shown on request
+RECENT_TURNS = 20
+
+# Answers reused when the same question is asked again about the same document
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL = 600
+
+API_KEYS = {
+    k: os.getenv(k)
+    for k in (
+        'OPENAI_API_KEY',
+        'FIRECRAWL_API_KEY',
+        'ZEP_API_KEY',
+        'VOYAGE_API_KEY',
+        'TENSORLAKE_API_KEY',
+    )
+}
 
 st.set_page_config(
     page_title="AI Research Assistant",
@@ -15,66 +57,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 3rem;
-        font-weight: bold;
-        text-align: center;
-        margin-bottom: 2rem;
-        background: linear-gradient(90deg, #1e3a8a, #3b82f6);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-    }
-    
-    .source-card {
-        background: #f8fafc;
-        border: 1px solid #e2e8f0;
-        border-radius: 8px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-    }
-    
-    .citation-item {
-        background: #ffffff;
-        border-left: 4px solid #3b82f6;
-        padding: 0.8rem;
-        margin: 0.3rem 0;
-        border-radius: 0 4px 4px 0;
-    }
-    
-    .status-success {
-        color: #059669;
-        font-weight: bold;
-    }
-    
-    .status-error {
-        color: #dc2626;
-        font-weight: bold;
-    }
-    
-    .status-warning {
-        color: #d97706;
-        font-weight: bold;
-    }
-    
-    .metric-card {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 1rem;
-        border-radius: 8px;
-        text-align: center;
-        margin: 0.5rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Read once per process; Streamlit's static server sends .css as text/plain, which browsers reject
+APP_CSS = (Path(__file__).parent / "static" / "app.css").read_text(encoding="utf-8")
+st.markdown(f"<style>{APP_CSS}</style>", unsafe_allow_html=True)
 
 def initialize_session_state():
     if 'assistant' not in st.session_state:
         st.session_state.assistant = None
     
     if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = deque(maxlen=HISTORY_LIMIT)
     
     if 'document_processed' not in st.session_state:
         st.session_state.document_processed = False
@@ -87,35 +79,158 @@ def initialize_session_state():
     
     if 'last_response' not in st.session_state:
         st.session_state.last_response = None
+    
+    if 'doc_sig' not in st.session_state:
+        st.session_state.doc_sig = None
+    
+    # Scopes the Zep user and thread, so each browser session has its own memory
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+@st.cache_resource(show_spinner=False)
+def _get_rag_pipeline(
+    db_path: str,
+    batch_size: int = 128,
+    index_type: str = "HNSW",
+    metric: str = "COSINE",
+    hnsw_m: int = 30,
+    hnsw_ef_construction: int = 200,
+    hnsw_ef: int = 100,
+) -> "RAGPipeline":
+    from src.rag import RAGPipeline
+    
+    # TensorLake, Voyage, Milvus and OpenAI clients are built once per process
+    return RAGPipeline(
+        tensorlake_api_key=API_KEYS["TENSORLAKE_API_KEY"],
+        voyage_api_key=API_KEYS["VOYAGE_API_KEY"],
+        openai_api_key=API_KEYS["OPENAI_API_KEY"],
+        milvus_db_path=db_path,
+        embedding_batch_size=batch_size,
+        index_type=index_type,
+        metric=metric,
+        hnsw_m=hnsw_m,
+        hnsw_ef_construction=hnsw_ef_construction,
+        hnsw_ef=hnsw_ef
+    )
+
+
+def _build_memory(user_id: str, thread_id: str) -> "ZepMemoryLayer":
+    from src.memory import ZepMemoryLayer
+    
+    # Not cached: the ids are per session, and Reset Chat must only wipe this session's thread
+    return ZepMemoryLayer(
+        user_id=user_id,
+        thread_id=thread_id,
+        zep_api_key=API_KEYS["ZEP_API_KEY"]
+    )
+
+
+def _build_flow(
+    user_id: str,
+    thread_id: str,
+    db_path: str,
+    batch_size: int = 128,
+    index_type: str = "HNSW",
+    metric: str = "COSINE",
+    hnsw_m: int = 30,
+    hnsw_ef_construction: int = 200,
+    hnsw_ef: int = 100,
+) -> "ResearchAssistantFlow":
+    # Deferred so the SDK-heavy workflow stack loads on first initialization,
+    # not on every page load
+    from src.workflows import ResearchAssistantFlow
+    
+    # One flow per session: it carries per-query state and crews, so it must not be
+    # shared; the RAG pipeline and memory layer underneath are the cached parts
+    return ResearchAssistantFlow(
+        openai_api_key=API_KEYS["OPENAI_API_KEY"],
+        firecrawl_api_key=API_KEYS["FIRECRAWL_API_KEY"],
+        rag_pipeline=_get_rag_pipeline(
+            db_path,
+            batch_size=batch_size,
+            index_type=index_type,
+            metric=metric,
+            hnsw_m=hnsw_m,
+            hnsw_ef_construction=hnsw_ef_construction,
+            hnsw_ef=hnsw_ef
+        ),
+        memory_layer=_build_memory(user_id, thread_id)
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _query_cache() -> Tuple["OrderedDict[Tuple[str, ...], Tuple[float, Dict[str, Any]]]", threading.Lock]:
+    # Streamed answers cannot go through st.cache_data, so keep a shared LRU instead
+    return OrderedDict(), threading.Lock()
+
 
-def check_api_keys() -> Dict[str, bool]:
-    api_keys = {
-        'OPENAI_API_KEY': bool(os.getenv('OPENAI_API_KEY')),
-        'FIRECRAWL_API_KEY': bool(os.getenv('FIRECRAWL_API_KEY')),
-        'ZEP_API_KEY': bool(os.getenv('ZEP_API_KEY')),
-        'VOYAGE_API_KEY': bool(os.getenv('VOYAGE_API_KEY')),
-        'TENSORLAKE_API_KEY': bool(os.getenv('TENSORLAKE_API_KEY'))
-    }
-    return api_keys
+def _get_cached_result(key: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    cache, lock = _query_cache()
+    with lock:
+        entry = cache.get(key)
+        if entry is None or time.time() - entry[0] > QUERY_CACHE_TTL:
+            return None
+        cache.move_to_end(key)
+        return entry[1]
+
+
+def _clear_cached_results(prefix: Tuple[str, ...]) -> None:
+    cache, lock = _query_cache()
+    with lock:
+        for key in [key for key in cache if key[:len(prefix)] == prefix]:
+            del cache[key]
+
+
+def _store_result(key: Tuple[str, ...], result: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(result, dict) and 'context_sources' in result:
+        result['_display'] = _prepare_display(result)
+    cache, lock = _query_cache()
+    with lock:
+        cache[key] = (time.time(), result)
+        cache.move_to_end(key)
+        while len(cache) > QUERY_CACHE_SIZE:
+            cache.popitem(last=False)
+    return result
 
 
 class StreamlitResearchAssistant:
-    def __init__(self, user_id: str = "streamlit_user", thread_id: str = "streamlit_session"):
+    def __init__(
+        self,
+        user_id: str = "streamlit_user",
+        thread_id: str = "streamlit_session",
+        milvus_db_path: str = "milvus_lite.db",
+        batch_size: int = 128,
+        index_type: str = "HNSW",
+        hnsw_m: int = 30,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef: int = 100,
+        metric: str = "COSINE",
+    ):
         self.user_id = user_id
         self.thread_id = thread_id
+        self.milvus_db_path = milvus_db_path
+        self.batch_size = batch_size
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef = hnsw_ef
+        self.metric = metric
         self.flow = None
         self.initialized = False
     
     def initialize(self) -> bool:
         try:
-            # Initialize the flow
-            self.flow = ResearchAssistantFlow(
-                tensorlake_api_key=os.getenv("TENSORLAKE_API_KEY"),
-                voyage_api_key=os.getenv("VOYAGE_API_KEY"),
-                openai_api_key=os.getenv("OPENAI_API_KEY"),
-                zep_api_key=os.getenv("ZEP_API_KEY"),
-                firecrawl_api_key=os.getenv("FIRECRAWL_API_KEY"),
-                milvus_db_path="milvus_lite.db"
+            # The assistant lives in st.session_state, so this runs once per session
+            self.flow = _build_flow(
+                self.user_id,
+                self.thread_id,
+                self.milvus_db_path,
+                batch_size=self.batch_size,
+                index_type=self.index_type,
+                metric=self.metric,
+                hnsw_m=self.hnsw_m,
+                hnsw_ef_construction=self.hnsw_ef_construction,
+                hnsw_ef=self.hnsw_ef
             )
             
             self.initialized = True
@@ -124,26 +239,39 @@ class StreamlitResearchAssistant:
             st.error(f"Failed to initialize Research Assistant: {str(e)}")
             return False
     
-    def query(self, user_query: str) -> Dict[str, Any]:
+    def _cache_key(self, user_query: str) -> Tuple[str, ...]:
+        # doc_sig changes whenever a different document is processed
+        return (self.user_id, self.thread_id, st.session_state.get('doc_sig') or "", user_query)
+    
+    def cached_result(self, user_query: str) -> Optional[Dict[str, Any]]:
+        result = _get_cached_result(self._cache_key(user_query))
+        if result is not None:
+            # The flow is skipped, but the turn still belongs in conversation memory
+            self.flow.record_turn(user_query, result.get('final_response', ''))
+        return result
+    
+    def clear_cached_results(self) -> None:
+        _clear_cached_results((self.user_id, self.thread_id))
+    
+    def query_stream(
+        self,
+        user_query: str,
+        progress_cb: Optional[Callable[[str], None]] = None
+    ) -> "ResponseStream":
         if not self.initialized:
-            return {"error": "Research Assistant not initialized"}
-        
-        try:
-            # Execute the flow
-            result = self.flow.kickoff(inputs={
-                "query": user_query,
-                "user_id": self.user_id,
-                "thread_id": self.thread_id
-            })
-            return result
-            
-        except Exception as e:
-            error_msg = f"Error processing query: {e}"
-            return {"error": error_msg}
+            raise Exception("Research Assistant not initialized")
+        return self.flow.query_stream(user_query, self.user_id, self.thread_id, progress_cb=progress_cb)
+    
+    def finish_stream(self, user_query: str, stream: "ResponseStream") -> Dict[str, Any]:
+        return _store_result(self._cache_key(user_query), stream.result)
 
 def create_research_assistant() -> Optional[StreamlitResearchAssistant]:
     try:
-        assistant = StreamlitResearchAssistant()
+        session_id = st.session_state.session_id
+        assistant = StreamlitResearchAssistant(
+            user_id=f"streamlit_user_{session_id}",
+            thread_id=f"streamlit_session_{session_id}"
+        )
         if assistant.initialize():
             return assistant
         return None
@@ -151,70 +279,72 @@ def create_research_assistant() -> Optional[StreamlitResearchAssistant]:
         st.error(f"Failed to create Research Assistant: {str(e)}")
         return None
 
+def _classify(e: Exception) -> Exception:
+    error_msg = str(e)
+    if "TensorLake" in error_msg:
+        return Exception(f"Document parsing failed: {error_msg}")
+    if "Embedding" in error_msg:
+        return Exception(f"Embedding generation failed: {error_msg}")
+    if "API" in error_msg or "key" in error_msg.lower():
+        return Exception(f"API authentication failed: {error_msg}")
+    return Exception(f"Document processing failed: {error_msg}")
+
+
 def process_uploaded_document(uploaded_file, assistant: StreamlitResearchAssistant) -> bool:
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file.flush()
-            os.fsync(tmp_file.fileno())
-            tmp_file_path = tmp_file.name
-        
-        st.session_state.processing_status = {
-            'stage': 'uploading',
-            'message': 'Uploading document...',
-            'progress': 0.1
-        }
-        
-        # Process document
-        progress_bar = st.progress(0.1)
-        status_text = st.empty()
-        
-        status_text.text("📄 Uploading document...")
-        time.sleep(0.5)
-        
-        progress_bar.progress(0.3)
-        status_text.text("🔍 Parsing document content...")
-        time.sleep(1)
+        if not assistant.initialized:
+            raise Exception("Research Assistant not initialized")
         
-        progress_bar.progress(0.6)
-        status_text.text("🧠 Generating embeddings...")
-        time.sleep(1)
+        doc_sig = hashlib.blake2b(uploaded_file.getbuffer(), digest_size=8).hexdigest()
         
-        progress_bar.progress(0.8)
-        status_text.text("💾 Storing in vector database...")
+        # Identical content is already parsed, embedded and stored
+        if assistant.flow.is_document_indexed(doc_sig):
+            st.session_state.current_document = uploaded_file.name
+            st.session_state.document_processed = True
+            st.session_state.doc_sig = doc_sig
+            st.session_state.processing_status = {
+                'stage': 'completed',
+                'message': f'Document "{uploaded_file.name}" already processed',
+                'progress': 1.0
+            }
+            return True
         
-        if assistant.initialized:
-            try:
-                results = assistant.flow.process_documents([tmp_file_path])
-                st.session_state.current_document = uploaded_file.name
-                st.session_state.document_processed = True
-                
-                progress_bar.progress(1.0)
-                status_text.text("✅ Document processed successfully!")
+        tmp_file_path = None
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+                # Stream in 1MB chunks rather than materializing the whole PDF
+                tmp_file_path = tmp_file.name
+                uploaded_file.seek(0)
+                shutil.copyfileobj(uploaded_file, tmp_file, length=1024 * 1024)
+            
+            st.session_state.processing_status = {
+                'stage': 'uploading',
+                'message': 'Uploading document...',
+                'progress': 0.1
+            }
+            
+            # Process document, driving the progress UI from real pipeline stages
+            with st.status("📄 Processing document...", expanded=False) as status:
+                progress_bar = st.progress(0.0)
                 
-                os.unlink(tmp_file_path)
+                def cb(stage: str, frac: float) -> None:
+                    progress_bar.progress(min(max(frac, 0.0), 1.0))
+                    status.update(label=stage)
                 
-            except Exception as e:
-                if os.path.exists(tmp_file_path):
-                    os.unlink(tmp_file_path)
+                try:
+                    assistant.flow.process_documents([tmp_file_path], progress_cb=cb, doc_sigs=[doc_sig])
+                except Exception as e:
+                    status.update(label="❌ Document processing failed", state="error")
+                    raise _classify(e) from e
                 
-                error_msg = str(e)
-                if "TensorLake" in error_msg:
-                    raise Exception(f"Document parsing failed: {error_msg}")
-                elif "Embedding" in error_msg:
-                    raise Exception(f"Embedding generation failed: {error_msg}")
-                elif "API" in error_msg or "key" in error_msg.lower():
-                    raise Exception(f"API authentication failed: {error_msg}")
-                else:
-                    raise Exception(f"Document processing failed: {error_msg}")
-        else:
-            if os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
-            raise Exception("Research Assistant not initialized")
+                st.session_state.current_document = uploaded_file.name
+                st.session_state.document_processed = True
+                st.session_state.doc_sig = doc_sig
+                status.update(label="✅ Document processed successfully!", state="complete")
+        finally:
+            if tmp_file_path:
+                Path(tmp_file_path).unlink(missing_ok=True)
     
-        time.sleep(1)
-        progress_bar.empty()
-        status_text.empty()
         st.session_state.processing_status = {
             'stage': 'completed',
             'message': f'Document "{uploaded_file.name}" processed successfully',
@@ -233,312 +363,356 @@ def process_uploaded_document(uploaded_file, assistant: StreamlitResearchAssista
         return False
 
 
-def display_citations_dropdown(response: Dict[str, Any], key: str):
-    if 'context_sources' not in response:
-        return
+SOURCE_SPECS = [
+    ('RAG (Documents)', 'rag_result', '📄', 'RAG'),
+    ('Memory (History)', 'memory_result', '🧠', 'Memory'),
+    ('Web Search', 'web_result', '🌐', 'Web'),
+    ('ArXiv Papers', 'tool_result', '📚', 'ArXiv'),
+]
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _web_status(source_data: Dict[str, Any]) -> str:
+    has_search_results = source_data.get('search_results')
+    has_explicit_status = source_data.get('status') == 'OK'
+    has_answer = source_data.get('answer')
+    has_relevance = source_data.get('relevance_assessment')
+    
+    if has_search_results or has_explicit_status or (has_answer and has_relevance):
+        return 'OK'
+    elif source_data.get('status') in ('ERROR', 'TIMEOUT'):
+        return source_data['status']
+    elif source_data.get('status') == 'INSUFFICIENT_CONTEXT':
+        return 'INSUFFICIENT_CONTEXT'
+    return 'UNKNOWN'
+
+
+def _render_memory(source_data: Dict[str, Any]) -> List[str]:
+    lines = []
+    context = source_data.get('context', [])
+    if context:
+        lines.append("**Memory Context:**")
+        
+        if isinstance(context, (list, tuple)):
+            for item in context[:6]:
+                item_str = str(item) if item is not None else ""
+                if len(item_str) > 200:
+                    truncated_item = item_str[:200] + "..."
+                else:
+                    truncated_item = item_str
+                lines.append(f"• {truncated_item}")
+            
+            if len(context) > 6:
+                lines.append(f"*...and {len(context) - 6} more items*")
+        else:
+            lines.append(f"• {str(context)[:500]}...")
+    
+    relevance = source_data.get('relevance_assessment', {})
+    if relevance:
+        citations = relevance.get('citations', [])
+        if citations:
+            lines.append("**Citations:**")
+            for citation in citations:
+                label = citation.get('label', 'Citation')
+                locator = citation.get('locator', 'N/A')
+                lines.append(f"• **{label}** ({locator})")
+        
+        confidence = relevance.get('confidence', 'N/A')
+        if confidence != 'N/A':
+            lines.append(f"**Confidence:** {confidence}")
+    return lines
+
+
+def _render_web(source_data: Dict[str, Any]) -> List[str]:
+    lines = []
+    search_results = source_data.get('search_results', [])
+    answer = source_data.get('answer', '')
+    
+    if search_results:
+        lines.append("**Web Search Results:**")
+        if isinstance(search_results, (list, tuple)):
+            for i, result in enumerate(search_results[:3]):
+                if isinstance(result, dict):
+                    title = result.get('title', 'No title')
+                    url = result.get('url', '#')
+                    content = str(result.get('content', 'No content'))[:150]
+                    lines.append(f"**{i+1}. [{title}]({url})**")
+                    lines.append(f"*{content}...*")
+                    lines.append("---")
+                else:
+                    lines.append(f"**{i+1}.** {str(result)[:200]}...")
+            
+            if len(search_results) > 3:
+                lines.append(f"*...and {len(search_results) - 3} more results*")
+        else:
+            lines.append(f"• {str(search_results)[:500]}...")
     
+    elif answer and answer.strip():
+        lines.append("**Web Search Content:**")
+        if answer.startswith('**') or '**' in answer:
+            lines.append(answer[:1000] + ('...' if len(answer) > 1000 else ''))
+        else:
+            lines.append(f"```\n{answer[:500]}{'...' if len(answer) > 500 else ''}\n```")
+    
+    relevance = source_data.get('relevance_assessment', {})
+    if relevance:
+        confidence = relevance.get('confidence', 'N/A')
+        if confidence != 'N/A':
+            lines.append(f"**Confidence:** {confidence}")
+    
+    citations = source_data['citations']
+    if citations:
+        lines.append("**Citations:**")
+        for citation in citations:
+            if isinstance(citation, dict):
+                label = citation.get('label', 'Web Citation')
+                locator = citation.get('locator', '#')
+                if locator.startswith('http'):
+                    lines.append(f"• [{label}]({locator})")
+                else:
+                    lines.append(f"• **{label}** ({locator})")
+            else:
+                lines.append(f"• {str(citation)}")
+    return lines
+
+
+def _render_arxiv(source_data: Dict[str, Any]) -> List[str]:
+    lines = []
+    answer = source_data.get('answer', '')
+    # The flow decodes JSON answers once; absent means the answer was not JSON
+    papers = source_data.get('_parsed_papers')
+    if papers is None:
+        papers = []
+        if answer:
+            lines.append("**ArXiv Response:**")
+            lines.append(f"```\n{str(answer)[:300]}...\n```")
+    
+    if papers:
+        lines.append("**Academic Papers:**")
+        if isinstance(papers, (list, tuple)):
+            for i, paper in enumerate(papers[:3]):
+                if isinstance(paper, dict):
+                    title = paper.get('title', 'No title')
+                    authors = paper.get('authors', [])
+                    url = paper.get('url', '#')
+                    abstract = str(paper.get('abstract', 'No abstract'))[:200]
+                    
+                    lines.append(f"**{i+1}. [{title}]({url})**")
+                    if authors and isinstance(authors, (list, tuple)):
+                        authors_str = ', '.join(str(author) for author in authors[:3])
+                        if len(authors) > 3:
+                            authors_str += f" and {len(authors) - 3} others"
+                        lines.append(f"*Authors: {authors_str}*")
+                    lines.append(f"*{abstract}...*")
+                    lines.append("---")
+                else:
+                    lines.append(f"**{i+1}.** {str(paper)[:200]}...")
+            
+            if len(papers) > 3:
+                lines.append(f"*...and {len(papers) - 3} more papers*")
+        else:
+            lines.append(f"• {str(papers)[:500]}...")
+    return lines
+
+
+def _render_rag(source_data: Dict[str, Any]) -> List[str]:
+    lines = ["**Content:**"]
+    answer = source_data.get('answer', 'No answer available')
+    if answer is None:
+        lines.append("```\nNo content available\n```")
+    elif isinstance(answer, (dict, list)):
+        try:
+            json_str = _pretty_json(answer)
+            preview = json_str[:300] if len(json_str) > 300 else json_str
+            ellipsis = '...' if len(json_str) > 300 else ''
+            lines.append(f"```json\n{preview}{ellipsis}\n```")
+        except Exception:
+            lines.append(f"```\n{str(answer)[:300]}...\n```")
+    else:
+        answer_str = str(answer)
+        preview = answer_str[:300] if len(answer_str) > 300 else answer_str
+        ellipsis = '...' if len(answer_str) > 300 else ''
+        lines.append(f"```\n{preview}{ellipsis}\n```")
+    
+    # Show citations with enhanced metadata
+    citations = source_data['citations']
+    if citations:
+        lines.append("**Citations:**")
+        for i, citation in enumerate(citations):
+            try:
+                if not isinstance(citation, dict):
+                    lines.append(f"• Citation {i+1}: {str(citation)}")
+                    continue
+                    
+                label = citation.get('label', f'Citation {i+1}')
+                locator = citation.get('locator', 'No location')
+                label = str(label) if label is not None else f'Citation {i+1}'
+                locator = str(locator) if locator is not None else 'No location'
+                
+                page_number = citation.get('page_number')
+                chunk_index = citation.get('chunk_index')
+                score = citation.get('score')
+                chunk_content = citation.get('content', '')
+                
+                if locator.startswith('http'):
+                    lines.append(f"• [{label}]({locator})")
+                elif page_number is not None and chunk_index is not None:
+                    score_text = f" (Score: {score:.3f})" if isinstance(score, (int, float)) else ""
+                    lines.append(f"**📄 Page {page_number}, Chunk {chunk_index}**{score_text}")
+                    
+                    if chunk_content:
+                        content_preview = chunk_content[:300] if len(chunk_content) > 300 else chunk_content
+                        ellipsis = '...' if len(chunk_content) > 300 else ''
+                        lines.append(f"```\n{content_preview}{ellipsis}\n```")
+                    else:
+                        lines.append("*No content preview available*")
+                elif 'chunk_' in locator:
+                    lines.append(f"• **{label}** (Document chunk)")
+                else:
+                    lines.append(f"• **{label}**")
+            except Exception as citation_error:
+                lines.append(f"• Citation {i+1}: Error displaying citation ({str(citation_error)})")
+    
+    # Show additional metadata
+    if 'retrieval_metadata' in source_data:
+        metadata = source_data['retrieval_metadata']
+        if 'retrieved_chunks' in metadata:
+            lines.append(f"**Retrieved Chunks:** {metadata['retrieved_chunks']}")
+        if 'document_count' in metadata:
+            lines.append(f"**Documents Searched:** {metadata['document_count']}")
+    return lines
+
+
+# Per-source status check and body renderer, keyed by evaluator source name
+_STATUS_CHECKS = {
+    'RAG': lambda source_data: source_data.get('status', 'UNKNOWN'),
+    'Memory': lambda source_data: 'OK',
+    'Web': _web_status,
+    'ArXiv': lambda source_data: source_data.get('status', 'UNKNOWN'),
+}
+
+_RENDERERS = {
+    'RAG': _render_rag,
+    'Memory': _render_memory,
+    'Web': _render_web,
+    'ArXiv': _render_arxiv,
+}
+
+
+def _prepare_source_blocks(source_key: str, source_data: Dict[str, Any], status: str) -> List[Tuple[str, str]]:
+    """Build the (kind, text) blocks shown inside a source expander"""
+    if status == 'INSUFFICIENT_CONTEXT':
+        return [('warning', f"{source_data.get('answer', 'No relevant information found')}")]
+    
+    if status != 'OK':
+        error_msg = source_data.get('error', source_data.get('message', source_data.get('answer', 'Unknown error')))
+        return [('error', f"{error_msg}")]
+    
+    lines = _RENDERERS[source_key](source_data)
+    
+    confidence = source_data.get('confidence', 'N/A')
+    if confidence != 'N/A':
+        if isinstance(confidence, (int, float)):
+            lines.append(f"**Confidence:** {confidence:.2f}")
+        else:
+            lines.append(f"**Confidence:** {confidence}")
+    
+    # Blank line keeps each line its own paragraph in a single st.markdown call
+    return [('markdown', "\n\n".join(lines))] if lines else []
+
+
+def _prepare_display(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten a flow response into display-ready strings once, so re-rendering
+    the citations dropdown does no slicing, JSON encoding or type checks.
+    """
     context_sources = response['context_sources']
     evaluation_result = response.get('evaluation_result', {})
     
+    summary = None
+    if 'relevant_sources' in evaluation_result:
+        relevance_scores = evaluation_result.get('relevance_scores', {})
+        score_lines = []
+        for source in evaluation_result['relevant_sources']:
+            score = relevance_scores.get(source, 'N/A')
+            if isinstance(score, (int, float)):
+                score_lines.append(f"• **{source}**: {score:.2f}")
+            else:
+                score_lines.append(f"• **{source}**: {score}")
+        summary = {
+            'scores': "\n\n".join(score_lines),
+            'reasoning': f"*{evaluation_result.get('reasoning', 'No reasoning provided')}*"
+        }
+    
+    # Only display sources that are marked as relevant by the evaluator;
+    # if no evaluation result is available, show all sources
+    relevant_source_keys = evaluation_result.get('relevant_sources', [])
+    sources = []
+    for source_name, result_key, icon, source_key in SOURCE_SPECS:
+        source_data = context_sources.get(result_key, {})
+        if not source_data:
+            continue
+        if relevant_source_keys and source_key not in relevant_source_keys:
+            continue
+        
+        # Normalize once so renderers can iterate citations without type guards
+        source_data['citations'] = _as_list(source_data.get('citations'))
+        status = _STATUS_CHECKS[source_key](source_data)
+        sources.append({
+            'title': f"{icon} **{source_name}** ({status})",
+            'blocks': _prepare_source_blocks(source_key, source_data, status)
+        })
+    
+    return {'summary': summary, 'sources': sources}
+
+
+def display_citations_dropdown(response: Dict[str, Any]):
+    if 'context_sources' not in response:
+        return
+    
     try:
-        relevant_source_keys = evaluation_result.get('relevant_sources', [])
+        display = response.get('_display') or _prepare_display(response)
         title = "📚 **View Sources & Citations**"
             
         with st.expander(title, expanded=False):
-            if 'relevant_sources' in evaluation_result:
+            summary = display['summary']
+            if summary:
                 st.markdown("#### 🎯 Source Relevance Summary")
                 
-                relevant_sources = evaluation_result['relevant_sources']
-                relevance_scores = evaluation_result.get('relevance_scores', {})
-                reasoning = evaluation_result.get('reasoning', 'No reasoning provided')
-                
                 col1, col2 = st.columns([1, 2])
                 with col1:
-                    st.markdown("**Relevant Sources:**")
-                    for source in relevant_sources:
-                        score = relevance_scores.get(source, 'N/A')
-                        if isinstance(score, (int, float)):
-                            st.markdown(f"• **{source}**: {score:.2f}")
-                        else:
-                            st.markdown(f"• **{source}**: {score}")
+                    st.markdown(f"**Relevant Sources:**\n\n{summary['scores']}")
                 
                 with col2:
-                    st.markdown("**Reasoning:**")
-                    st.markdown(f"*{reasoning}*")
+                    st.markdown(f"**Reasoning:**\n\n{summary['reasoning']}")
                 
                 st.markdown("---")
             
-            # Only display sources that are marked as relevant by the evaluator
-            all_sources = [
-                ('RAG (Documents)', context_sources.get('rag_result', {}), '📄', 'RAG'),
-                ('Memory (History)', context_sources.get('memory_result', {}), '🧠', 'Memory'), 
-                ('Web Search', context_sources.get('web_result', {}), '🌐', 'Web'),
-                ('ArXiv Papers', context_sources.get('tool_result', {}), '📚', 'ArXiv')
-            ]
-            # Filter sources based on evaluation result
-            relevant_source_keys = evaluation_result.get('relevant_sources', [])
-            # If no evaluation result available, show all sources
-            if not relevant_source_keys:
-                sources = [(name, data, icon) for name, data, icon, key in all_sources if data]
-            else:
-                # Only show sources that were marked as relevant
-                sources = []
-                for name, data, icon, key in all_sources:
-                    if data and key in relevant_source_keys:
-                        sources.append((name, data, icon))
-            
-            if not sources:
+            if not display['sources']:
                 st.markdown("*No relevant sources found for this query.*")
                 return
             
-            for source_name, source_data, icon in sources:
-                if not source_data:
-                    continue
-                
-                if source_name == 'Memory (History)':
-                    status = 'OK'
-                elif source_name == 'Web Search':
-                    has_search_results = source_data.get('search_results')
-                    has_explicit_status = source_data.get('status') == 'OK'
-                    has_answer = source_data.get('answer')
-                    has_relevance = source_data.get('relevance_assessment')
-                    
-                    if has_search_results or has_explicit_status or (has_answer and has_relevance):
-                        status = 'OK'
-                    elif source_data.get('status') == 'ERROR':
-                        status = 'ERROR'
-                    elif source_data.get('status') == 'INSUFFICIENT_CONTEXT':
-                        status = 'INSUFFICIENT_CONTEXT'
-                    else:
-                        status = 'UNKNOWN'
-                elif source_name == 'ArXiv Papers':
-                    status = source_data.get('status', 'UNKNOWN')
-                else:  # RAG
-                    status = source_data.get('status', 'UNKNOWN')
-                
+            for source in display['sources']:
                 # Create expandable section for each source
-                with st.expander(f"{icon} **{source_name}** ({status})", expanded=False):
-                    
-                    if status == 'OK':
-                        if source_name == 'Memory (History)':
-                            context = source_data.get('context', [])
-                            if context:
-                                st.markdown("**Memory Context:**")
-                                
-                                if isinstance(context, (list, tuple)):
-                                    items_to_show = context[:6]
-                                    for i, item in enumerate(items_to_show):
-                                        item_str = str(item) if item is not None else ""
-                                        if len(item_str) > 200:
-                                            truncated_item = item_str[:200] + "..."
-                                        else:
-                                            truncated_item = item_str
-                                        st.markdown(f"• {truncated_item}")
-                                    
-                                    if len(context) > 6:
-                                        st.markdown(f"*...and {len(context) - 6} more items*")
-                                else:
-                                    st.markdown(f"• {str(context)[:500]}...")
-                            
-                            relevance = source_data.get('relevance_assessment', {})
-                            if relevance:
-                                citations = relevance.get('citations', [])
-                                if citations:
-                                    st.markdown("**Citations:**")
-                                    for citation in citations:
-                                        label = citation.get('label', 'Citation')
-                                        locator = citation.get('locator', 'N/A')
-                                        st.markdown(f"• **{label}** ({locator})")
-                                
-                                confidence = relevance.get('confidence', 'N/A')
-                                if confidence != 'N/A':
-                                    st.markdown(f"**Confidence:** {confidence}")
-                        
-                        elif source_name == 'Web Search':
-                            search_results = source_data.get('search_results', [])
-                            answer = source_data.get('answer', '')
-                            
-                            if search_results:
-                                st.markdown("**Web Search Results:**")
-                                if isinstance(search_results, (list, tuple)):
-                                    results_to_show = search_results[:3]
-                                    for i, result in enumerate(results_to_show):
-                                        if isinstance(result, dict):
-                                            title = result.get('title', 'No title')
-                                            url = result.get('url', '#')
-                                            content = str(result.get('content', 'No content'))[:150]
-                                            st.markdown(f"**{i+1}. [{title}]({url})**")
-                                            st.markdown(f"*{content}...*")
-                                            st.markdown("---")
-                                        else:
-                                            st.markdown(f"**{i+1}.** {str(result)[:200]}...")
-                                    
-                                    if len(search_results) > 3:
-                                        st.markdown(f"*...and {len(search_results) - 3} more results*")
-                                else:
-                                    st.markdown(f"• {str(search_results)[:500]}...")
-                            
-                            elif answer and answer.strip():
-                                st.markdown("**Web Search Content:**")
-                                if answer.startswith('**') or '**' in answer:
-                                    st.markdown(answer[:1000] + ('...' if len(answer) > 1000 else ''))
-                                else:
-                                    st.markdown(f"```\n{answer[:500]}{'...' if len(answer) > 500 else ''}\n```")
-                            
-                            relevance = source_data.get('relevance_assessment', {})
-                            if relevance:
-                                confidence = relevance.get('confidence', 'N/A')
-                                if confidence != 'N/A':
-                                    st.markdown(f"**Confidence:** {confidence}")
-                            
-                            citations = source_data.get('citations', [])
-                            if citations:
-                                st.markdown("**Citations:**")
-                                for citation in citations:
-                                    if isinstance(citation, dict):
-                                        label = citation.get('label', 'Web Citation')
-                                        locator = citation.get('locator', '#')
-                                        if locator.startswith('http'):
-                                            st.markdown(f"• [{label}]({locator})")
-                                        else:
-                                            st.markdown(f"• **{label}** ({locator})")
-                                    else:
-                                        st.markdown(f"• {str(citation)}")
-                        
-                        elif source_name == 'ArXiv Papers':
-                            answer = source_data.get('answer', '')
-                            papers = []
-                            if answer:
-                                try:
-                                    import json
-                                    parsed_answer = json.loads(answer)
-                                    papers = parsed_answer.get('papers', [])
-                                except json.JSONDecodeError:
-                                    st.markdown("**ArXiv Response:**")
-                                    st.markdown(f"```\n{answer[:300]}...\n```")
-                            
-                            if papers:
-                                st.markdown("**Academic Papers:**")
-                                if isinstance(papers, (list, tuple)):
-                                    papers_to_show = papers[:3]
-                                    for i, paper in enumerate(papers_to_show):
-                                        if isinstance(paper, dict):
-                                            title = paper.get('title', 'No title')
-                                            authors = paper.get('authors', [])
-                                            url = paper.get('url', '#')
-                                            abstract = str(paper.get('abstract', 'No abstract'))[:200]
-                                            
-                                            st.markdown(f"**{i+1}. [{title}]({url})**")
-                                            if authors and isinstance(authors, (list, tuple)):
-                                                authors_to_show = authors[:3] if len(authors) > 3 else authors
-                                                authors_str = ', '.join(str(author) for author in authors_to_show)
-                                                if len(authors) > 3:
-                                                    authors_str += f" and {len(authors) - 3} others"
-                                                st.markdown(f"*Authors: {authors_str}*")
-                                            st.markdown(f"*{abstract}...*")
-                                            st.markdown("---")
-                                        else:
-                                            st.markdown(f"**{i+1}.** {str(paper)[:200]}...")
-                                    
-                                    if len(papers) > 3:
-                                        st.markdown(f"*...and {len(papers) - 3} more papers*")
-                                else:
-                                    st.markdown(f"• {str(papers)[:500]}...")
-                        
-                        else:  # RAG or other sources
-                            st.markdown("**Content:**")
-                            try:
-                                answer = source_data.get('answer', 'No answer available')
-                                if answer is None:
-                                    st.markdown("```\nNo content available\n```")
-                                elif isinstance(answer, (str)):
-                                    preview = answer[:300] if len(answer) > 300 else answer
-                                    ellipsis = '...' if len(answer) > 300 else ''
-                                    st.markdown(f"```\n{preview}{ellipsis}\n```")
-                                elif isinstance(answer, (dict, list)):
-                                    try:
-                                        import json
-                                        json_str = json.dumps(answer, indent=2)
-                                        preview = json_str[:300] if len(json_str) > 300 else json_str
-                                        ellipsis = '...' if len(json_str) > 300 else ''
-                                        st.markdown(f"```json\n{preview}{ellipsis}\n```")
-                                    except Exception:
-                                        st.markdown(f"```\n{str(answer)[:300]}...\n```")
-                                else:
-                                    answer_str = str(answer)
-                                    preview = answer_str[:300] if len(answer_str) > 300 else answer_str
-                                    ellipsis = '...' if len(answer_str) > 300 else ''
-                                    st.markdown(f"```\n{preview}{ellipsis}\n```")
-                                    
-                            except Exception as answer_error:
-                                st.error(f"Error displaying answer: {str(answer_error)}")
-                                st.markdown("```\nError loading content\n```")
-                            
-                            # Show citations with enhanced metadata
-                            citations = source_data.get('citations', [])
-                            if citations and isinstance(citations, (list, tuple)):
-                                st.markdown("**Citations:**")
-                                for i, citation in enumerate(citations):
-                                    try:
-                                        if not isinstance(citation, dict):
-                                            st.markdown(f"• Citation {i+1}: {str(citation)}")
-                                            continue
-                                            
-                                        label = citation.get('label', f'Citation {i+1}')
-                                        locator = citation.get('locator', 'No location')
-                                        label = str(label) if label is not None else f'Citation {i+1}'
-                                        locator = str(locator) if locator is not None else 'No location'
-                                        
-                                        page_number = citation.get('page_number')
-                                        chunk_index = citation.get('chunk_index')
-                                        score = citation.get('score')
-                                        chunk_content = citation.get('content', '')
-                                        
-                                        if locator.startswith('http'):
-                                            st.markdown(f"• [{label}]({locator})")
-                                        elif page_number is not None and chunk_index is not None:
-                                            score_text = f" (Score: {score:.3f})" if isinstance(score, (int, float)) else ""
-                                            st.markdown(f"**📄 Page {page_number}, Chunk {chunk_index}**{score_text}")
-                                            
-                                            if chunk_content:
-                                                content_preview = chunk_content[:300] if len(chunk_content) > 300 else chunk_content
-                                                ellipsis = '...' if len(chunk_content) > 300 else ''
-                                                st.markdown(f"```\n{content_preview}{ellipsis}\n```")
-                                            else:
-                                                st.markdown("*No content preview available*")
-                                        elif 'chunk_' in locator:
-                                            st.markdown(f"• **{label}** (Document chunk)")
-                                        else:
-                                            st.markdown(f"• **{label}**")
-                                    except Exception as citation_error:
-                                        st.markdown(f"• Citation {i+1}: Error displaying citation ({str(citation_error)})")
-                            elif citations:
-                                st.markdown("**Citations:**")
-                                st.markdown(f"• Raw citation data: {str(citations)[:200]}...")
-                            
-                            # Show additional metadata
-                            if 'retrieval_metadata' in source_data:
-                                metadata = source_data['retrieval_metadata']
-                                if 'retrieved_chunks' in metadata:
-                                    st.markdown(f"**Retrieved Chunks:** {metadata['retrieved_chunks']}")
-                                if 'document_count' in metadata:
-                                    st.markdown(f"**Documents Searched:** {metadata['document_count']}")
-                        
-                        confidence = source_data.get('confidence', 'N/A')
-                        if confidence != 'N/A':
-                            if isinstance(confidence, (int, float)):
-                                st.markdown(f"**Confidence:** {confidence:.2f}")
-                            else:
-                                st.markdown(f"**Confidence:** {confidence}")
-                    
-                    elif status == 'INSUFFICIENT_CONTEXT':
-                        st.warning(f"{source_data.get('answer', 'No relevant information found')}")
-                    
-                    else:
-                        error_msg = source_data.get('error', source_data.get('message', source_data.get('answer', 'Unknown error')))
-                        st.error(f"{error_msg}")
+                with st.expander(source['title'], expanded=False):
+                    for kind, text in source['blocks']:
+                        if kind == 'warning':
+                            st.warning(text)
+                        elif kind == 'error':
+                            st.error(text)
+                        else:
+                            st.markdown(text)
     
     except Exception as e:
+        context_sources = response.get('context_sources')
+        evaluation_result = response.get('evaluation_result', {})
         st.error(f"❌ Error displaying citations: {str(e)}")
         st.caption(f"Debug info: Error type: {type(e).__name__}")
         
@@ -606,6 +780,20 @@ def display_sidebar_document_processing():
         else:
             st.error("🤖 Assistant: Offline")
 
+def display_chat_turn(query: str, response: Any):
+    with st.container():
+        # User message
+        st.markdown(f"**🧑 You:** {query}")
+        # Assistant response
+        if isinstance(response, dict) and 'final_response' in response:
+            st.markdown(f"**🤖 Assistant:** {response['final_response']}")
+            # Add citations dropdown
+            display_citations_dropdown(response)
+        else:
+            st.markdown(f"**🤖 Assistant:** {response}")
+        
+        st.markdown("---")
+
 def display_main_chat_interface():
     col1, col2 = st.columns([4, 1])
     
@@ -613,7 +801,12 @@ def display_main_chat_interface():
         st.markdown("## 💬 Research Chat")
     with col2:
         if st.button("🔄 Reset Chat", type="secondary", key="reset_chat"):
-            st.session_state.chat_history = []
+            # Conversation memory is only wiped here, never on (re)initialization
+            assistant = st.session_state.assistant
+            if assistant and assistant.initialized:
+                assistant.flow.memory_layer.reset_thread()
+                assistant.clear_cached_results()
+            st.session_state.chat_history = deque(maxlen=HISTORY_LIMIT)
             st.session_state.last_response = None
             st.success("Chat reset!")
             st.rerun()
@@ -622,49 +815,47 @@ def display_main_chat_interface():
         st.warning("⚠️ Please process a document first using the sidebar.")
         return
     
-    # Display chat history
-    for i, (query, response) in enumerate(st.session_state.chat_history):
-        with st.container():
-            # User message
-            st.markdown(f"**🧑 You:** {query}")
-            # Assistant response
-            if isinstance(response, dict) and 'final_response' in response:
-                st.markdown(f"**🤖 Assistant:** {response['final_response']}")
-                # Add citations dropdown
-                display_citations_dropdown(response, f"citations_{i}")
-            else:
-                st.markdown(f"**🤖 Assistant:** {response}")
-            
-            st.markdown("---")
+    # Display chat history; only the most recent turns render unless older ones are requested
+    history = list(st.session_state.chat_history)
+    first_recent = max(len(history) - RECENT_TURNS, 0)
+    if first_recent and st.toggle(f"Show {first_recent} earlier messages", key="show_older_turns"):
+        for turn in history[:first_recent]:
+            display_chat_turn(*turn)
+    for turn in history[first_recent:]:
+        display_chat_turn(*turn)
 
     query = st.chat_input("Ask me anything about your document...")
     
     if query:
-        # Add user message to history
-        with st.spinner("🔍 Researching your question..."):
-            try:
-                # Show progress steps
-                progress_container = st.container()
-                with progress_container:
-                    st.info("📄 **Step 1/4:** Analyzing document...")
-                    time.sleep(0.5)
-                    st.info("🧠 **Step 2/4:** Retrieving memories...")
-                    time.sleep(0.5)
-                    st.info("🌐 **Step 3/4:** Searching web...")
-                    time.sleep(0.5)
-                    st.info("📚 **Step 4/4:** Searching academic papers...")
-                    time.sleep(0.5)
-                
-                result = st.session_state.assistant.query(query)
-
-                progress_container.empty()
-                # Add to chat history
-                st.session_state.chat_history.append((query, result))
-                st.session_state.last_response = result
-                st.rerun()
+        try:
+            assistant = st.session_state.assistant
+            result = assistant.cached_result(query)
+            
+            if result is None:
+                st.markdown(f"**🧑 You:** {query}")
+                # Step labels follow the flow as each stage actually starts
+                with st.status("🔍 Researching your question...", expanded=False) as status:
+                    stream = assistant.query_stream(query, progress_cb=lambda stage: status.update(label=stage))
+                    status.update(label="✅ Research complete", state="complete")
                 
-            except Exception as e:
-                st.error(f"Error processing query: {str(e)}")
+                # Show the answer as it is generated instead of after the whole flow finishes.
+                # The in-flight text is plain so markdown is not re-parsed per token; the
+                # rerun below renders the finished turn with markdown and citations.
+                st.markdown("**🤖 Assistant:**")
+                placeholder = st.empty()
+                answer = ""
+                for token in stream:
+                    answer += token
+                    placeholder.text(answer)
+                result = assistant.finish_stream(query, stream)
+            
+            # Add to chat history
+            st.session_state.chat_history.append((query, result))
+            st.session_state.last_response = result
+            st.rerun()
+            
+        except Exception as e:
+            st.error(f"Error processing query: {str(e)}")
 
 def display_initialization_message():
     st.info("⚠️ Please initialize the Research Assistant using the sidebar to begin.")
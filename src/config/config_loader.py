@@ -1,7 +1,18 @@
 import os
+import copy
 import yaml
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Parsed YAML keyed by absolute path, validated against (mtime, size)
+_YAML_CACHE: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+_YAML_CACHE_SIZE = 100
 
 class ConfigLoader:
     """Utility class for loading YAML configuration files"""
@@ -29,13 +40,26 @@ class ConfigLoader:
             if not file_path.exists():
                 raise FileNotFoundError(f"Configuration file not found: {file_path}")
             
+            key = str(file_path.resolve())
+            stat = os.stat(key)
+            cached = _YAML_CACHE.get(key)
+            if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+                _YAML_CACHE.move_to_end(key)
+                # Copy so callers mutating the config cannot corrupt the cache
+                return copy.deepcopy(cached[2])
+            
             with open(file_path, 'r', encoding='utf-8') as file:
-                content = yaml.safe_load(file)
+                content = yaml.load(file, Loader=SafeLoader)
                 
             if content is None:
                 raise ValueError(f"Empty or invalid YAML file: {file_path}")
+            
+            _YAML_CACHE[key] = (stat.st_mtime, stat.st_size, content)
+            _YAML_CACHE.move_to_end(key)
+            if len(_YAML_CACHE) > _YAML_CACHE_SIZE:
+                _YAML_CACHE.popitem(last=False)
                 
-            return content
+            return copy.deepcopy(content)
             
         except yaml.YAMLError as e:
             raise ValueError(f"Error parsing YAML file {file_path}: {e}")
@@ -1,6 +1,6 @@
 import os
 import json
-from typing import Iterable, List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional, Set
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -55,8 +55,11 @@ RESEARCH_PAPER_SCHEMA = {
 }
 
 class TensorLakeClient:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, verbose: bool = False):
         self.doc_ai = DocumentAI(api_key=api_key or TENSORLAKE_API_KEY)
+        self.verbose = verbose
+        # File IDs known to exist remotely, so parses can skip a full file listing
+        self._known_ids: Set[str] = set()
     
     def list_uploaded_files(self):
         try:
@@ -70,10 +73,13 @@ class TensorLakeClient:
             return []
     
     def verify_file_uploaded(self, file_id: str) -> bool:
+        if file_id in self._known_ids:
+            return True
         try:
+            # Merge rather than replace: a failed listing returns [] and must not forget uploads
             files = self.list_uploaded_files()
-            file_ids = [f.id for f in files]
-            exists = file_id in file_ids
+            self._known_ids.update(f.id for f in files)
+            exists = file_id in self._known_ids
             print(f"File ID {file_id} {'exists' if exists else 'NOT FOUND'} in TensorLake")
             return exists
         except Exception as e:
@@ -81,8 +87,9 @@ class TensorLakeClient:
             return False
 
     def upload(self, paths: Iterable[str]) -> List[str]:
-        print("Files before upload:")
-        files_before = self.list_uploaded_files()
+        if self.verbose:
+            print("Files before upload:")
+            files_before = self.list_uploaded_files()
         
         file_ids = []
         for path in paths:
@@ -103,16 +110,19 @@ class TensorLakeClient:
                 print(f"Upload failed for {path}: {upload_error}")
                 raise
         
-        print("\nFiles after upload:")
-        files_after = self.list_uploaded_files()
+        self._known_ids.update(file_ids)
         
-        new_files = [f for f in files_after if f not in files_before]
-        if new_files:
-            print(f"{len(new_files)} new file(s) uploaded:")
-            for file_info in new_files:
-                print(f"  - {file_info.name} (ID: {file_info.id})")
-        else:
-            print("No new files detected in TensorLake after upload")
+        if self.verbose:
+            print("\nFiles after upload:")
+            files_after = self.list_uploaded_files()
+            
+            new_files = [f for f in files_after if f not in files_before]
+            if new_files:
+                print(f"{len(new_files)} new file(s) uploaded:")
+                for file_info in new_files:
+                    print(f"  - {file_info.name} (ID: {file_info.id})")
+            else:
+                print("No new files detected in TensorLake after upload")
             
         return file_ids
 
@@ -1,8 +1,16 @@
 import os
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import httpx
 from openai import OpenAI
 
+from src.http_client import get_http_client
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 SYSTEM_PROMPT = """You are a research assistant that MUST ground answers in provided context.
 Policy:
 1) Use only the supplied CONTEXT and/or explicit SOURCE items.
@@ -49,6 +57,38 @@ RESPONSE_SCHEMA = {
 }
 
 
+def _split_template(template: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Pre-split a "...{context}...{query}..." template so prompts are built by
+    concatenation. Returns None for templates that need str.format.
+    """
+    if template.count("{context}") != 1 or template.count("{query}") != 1:
+        return None
+    prefix, rest = template.split("{context}")
+    if "{query}" not in rest:
+        return None
+    mid, end = rest.split("{query}")
+    # Any other braces are format fields or escapes
+    if any("{" in part or "}" in part for part in (prefix, mid, end)):
+        return None
+    return prefix, mid, end
+
+
+def _build_response_format(schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "research_briefing",
+            "schema": schema,
+            "strict": True  # hard schema adherence
+        }
+    }
+
+
+# Built once at import; generate() reuses it unless a custom schema is passed
+_RESPONSE_FORMAT = _build_response_format(RESPONSE_SCHEMA)
+
+
 class StructuredResponseGen:
     def __init__(
         self,
@@ -57,11 +97,16 @@ class StructuredResponseGen:
         system_prompt: str = SYSTEM_PROMPT,
         rag_template: str = RAG_TEMPLATE,
         temperature: float = 0.2,
+        http_client: Optional[httpx.Client] = None,
     ):
-        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.client = OpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            http_client=http_client or get_http_client()
+        )
         self.model = model
         self.system_prompt = system_prompt
         self.rag_template = rag_template
+        self._template_parts = _split_template(rag_template)
         self.temperature = temperature
 
     def generate(
@@ -73,7 +118,11 @@ class StructuredResponseGen:
         schema: Dict[str, Any] = RESPONSE_SCHEMA,
     ) -> Dict[str, Any]:
         context = "\n\n".join(context_blocks).strip()
-        user_prompt = self.rag_template.format(context=context, query=query)
+        if self._template_parts:
+            prefix, mid, end = self._template_parts
+            user_prompt = f"{prefix}{context}{mid}{query}{end}"
+        else:
+            user_prompt = self.rag_template.format(context=context, query=query)
 
         response = self.client.chat.completions.create(
             model=self.model,
@@ -82,14 +131,7 @@ class StructuredResponseGen:
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "research_briefing",
-                    "schema": schema,
-                    "strict": True  # hard schema adherence
-                }
-            },
+            response_format=_RESPONSE_FORMAT if schema is RESPONSE_SCHEMA else _build_response_format(schema),
         )
 
         try:
@@ -98,9 +140,33 @@ class StructuredResponseGen:
             raise RuntimeError(f"Unexpected responses payload shape: {e}")
 
         try:
-            data = json.loads(output_text)
+            data = json_loads(output_text)
         except json.JSONDecodeError as e:
             raise RuntimeError(f"Model did not return valid JSON: {e}\nRaw: {output_text[:400]}")
 
         data["source_used"] = source_used
-        return data
\ No newline at end of file
+        return data
+
+    def stream_text(
+        self,
+        *,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        llm_params: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """
+        Yield a free-form completion token by token as it is generated.
+        llm_params (model, optional temperature) replace this generator's own settings.
+        """
+        params = llm_params if llm_params is not None else {"model": self.model, "temperature": self.temperature}
+        stream = self.client.chat.completions.create(
+            **params,
+            messages=[
+                {"role": "system", "content": system_prompt or self.system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            stream=True,
+        )
+        for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
@@ -1,10 +1,15 @@
 import os
-import time
-from typing import Optional, Any, Dict
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Optional, Any, Dict, Set
+import httpx
 from zep_cloud.client import Zep
+from zep_cloud.errors import NotFoundError
 from zep_crewai import ZepUserStorage
 from crewai.memory.external.external_memory import ExternalMemory
 
+from src.http_client import get_http_client
+
 
 class ZepMemoryLayer:
     def __init__(
@@ -12,22 +17,32 @@ class ZepMemoryLayer:
         user_id: str,
         thread_id: str,
         mode: str = "summary",
-        indexing_wait_time: int = 10,
         zep_api_key: Optional[str] = None,
+        http_client: Optional[httpx.Client] = None,
     ):
-        self.zep_client = Zep(api_key=zep_api_key or os.getenv("ZEP_API_KEY"))
+        self.zep_client = Zep(
+            api_key=zep_api_key or os.getenv("ZEP_API_KEY"),
+            httpx_client=http_client or get_http_client()
+        )
         self.user_id = user_id
         self.thread_id = thread_id
-        self.indexing_wait_time = indexing_wait_time
+        # Bumped on every write so readers can tell when a cached context block is stale
+        self.version = 0
+        # Single worker so background saves reach Zep in the order they were made
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zep-writer")
+        self._pending: Set[Future] = set()
+        self._pending_lock = threading.Lock()
 
         try:
             self.zep_client.user.get(self.user_id)
         except:
             self.zep_client.user.add(user_id=self.user_id)
         
-        # Create new session by first deleting the previous one
-        self.zep_client.thread.delete(self.thread_id)
-        self.zep_client.thread.create(thread_id=self.thread_id, user_id=self.user_id)
+        # Reuse the existing thread so reconnects keep their history
+        try:
+            self.zep_client.thread.get(self.thread_id)
+        except NotFoundError:
+            self.zep_client.thread.create(thread_id=self.thread_id, user_id=self.user_id)
 
         self.user_storage = ZepUserStorage(
             client=self.zep_client,
@@ -37,6 +52,14 @@ class ZepMemoryLayer:
         )
         self.external_memory = ExternalMemory(storage=self.user_storage)
 
+    def reset_thread(self) -> None:
+        """Wipe the conversation history by recreating the thread"""
+        # Queued saves must not land in the recreated thread
+        self.wait_for_pending_saves()
+        self.zep_client.thread.delete(self.thread_id)
+        self.zep_client.thread.create(thread_id=self.thread_id, user_id=self.user_id)
+        self.version += 1
+
     def as_external_memory(self) -> ExternalMemory:
         return self.external_memory
 
@@ -45,21 +68,46 @@ class ZepMemoryLayer:
             text,
             metadata={"type": "message", "role": "user", "name": name or "User", **meta},
         )
+        self.version += 1
 
     def save_assistant_message(self, text: str, name: Optional[str] = None, **meta: Any) -> None:
         self.external_memory.save(
             text,
             metadata={"type": "message", "role": "assistant", "name": name or "Assistant", **meta},
         )
+        self.version += 1
+
+    def save_user_message_in_background(self, text: str, name: Optional[str] = None, **meta: Any) -> Future:
+        return self._submit(self.save_user_message, text, name, **meta)
+
+    def save_assistant_message_in_background(self, text: str, name: Optional[str] = None, **meta: Any) -> Future:
+        return self._submit(self.save_assistant_message, text, name, **meta)
+
+    def wait_for_pending_saves(self, timeout: Optional[float] = None) -> None:
+        with self._pending_lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def _submit(self, save, *args: Any, **kwargs: Any) -> Future:
+        # Keeps the Zep round-trip off the caller's critical path; failures are logged, not raised
+        future = self._writer.submit(save, *args, **kwargs)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._on_save_done)
+        return future
+
+    def _on_save_done(self, future: Future) -> None:
+        with self._pending_lock:
+            self._pending.discard(future)
+        if future.exception() is not None:
+            print(f"Background memory save failed: {future.exception()}")
 
     def save_preferences(self, prefs: Dict[str, Any]) -> None:
         self.external_memory.save(
             str({"preferences": prefs}),
             metadata={"type": "json", "category": "preferences"},
         )
-
-    def wait_for_indexing(self) -> None:
-        time.sleep(self.indexing_wait_time)
+        self.version += 1
 
     def get_context_block(self) -> str:
         """
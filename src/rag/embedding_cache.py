@@ -0,0 +1,77 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+
+# On-disk element type per Voyage output_dtype; float vectors are stored at half precision
+STORAGE_DTYPES = {
+    "float": np.float16,
+    "int8": np.int8,
+    "uint8": np.uint8,
+    "binary": np.int8,
+    "ubinary": np.uint8,
+}
+
+
+class EmbeddingCache:
+    """SQLite-backed store of embedding matrices keyed by a SHA-256 of their inputs"""
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        # Shared by the ingestion worker threads; all access goes through the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dtype TEXT NOT NULL, rows INTEGER NOT NULL, "
+            "dim INTEGER NOT NULL, data BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        texts: Iterable[str],
+        *,
+        model: str,
+        output_dtype: str,
+        output_dimension: int,
+        input_type: str = "document"
+    ) -> str:
+        # Queries and documents embed differently; document keys keep their original form
+        prefix = f"{model}|{output_dtype}|{output_dimension}"
+        if input_type != "document":
+            prefix += f"|{input_type}"
+        h = hashlib.sha256(prefix.encode())
+        for text in texts:
+            h.update(b"\x00")
+            h.update(unicodedata.normalize("NFC", text).encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[List[List[float]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dtype, rows, dim, data FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        output_dtype, rows, dim, data = row
+        matrix = np.frombuffer(data, dtype=STORAGE_DTYPES[output_dtype]).reshape(rows, dim)
+        if output_dtype == "float":
+            matrix = matrix.astype(np.float32)
+        return matrix.tolist()
+
+    def put(self, key: str, embeddings: List[List[float]], output_dtype: str) -> None:
+        if not embeddings:
+            return
+        matrix = np.asarray(embeddings, dtype=STORAGE_DTYPES[output_dtype])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, dtype, rows, dim, data) VALUES (?, ?, ?, ?, ?)",
+                (key, output_dtype, matrix.shape[0], matrix.shape[1], matrix.tobytes())
+            )
+            self._conn.commit()
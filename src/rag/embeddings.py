@@ -1,42 +1,132 @@
 import os
+import functools
 import voyageai
-from typing import List, Optional, Literal
+from typing import Iterator, List, Optional, Literal
 from dotenv import load_dotenv
 
+from src.rag.embedding_cache import EmbeddingCache
+
 load_dotenv()
 
 VOYAGE_API_KEY = os.getenv("VOYAGE_API_KEY")
 
 
+DEFAULT_BATCH_SIZE = 128
+
+DEFAULT_EMBEDDING_MODEL = "voyage-context-3"
+
+# Voyage client retries (exponential backoff) on rate limits and transient errors
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+
+# Query embeddings kept per embedder, keyed by (query, dimension, dtype)
+QUERY_CACHE_SIZE = 1024
+
+
 class ContextualizedEmbeddings:
-    def __init__(self, api_key: Optional[str] = None, model: str = "voyage-context-3"):
-        self.client = voyageai.Client(api_key=api_key or VOYAGE_API_KEY)
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        output_dtype: Literal["float", "int8", "uint8", "binary", "ubinary"] = "int8",
+        output_dimension: int = 1024,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.client = voyageai.Client(api_key=api_key or VOYAGE_API_KEY, max_retries=EMBED_MAX_RETRIES)
         self.model = model
+        self.batch_size = batch_size
+        # Documents and queries must share dtype and dimension to be comparable
+        self.output_dtype = output_dtype
+        self.output_dimension = output_dimension
+        # Bound per instance so cached vectors never outlive or cross clients
+        self._embed_query_cached = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self._embed_query)
+        # Persistent document and query embeddings, so repeated text skips the API across restarts
+        self.cache = cache
+
+    def _batch_documents(self, docs_chunks: List[List[str]]) -> Iterator[List[List[str]]]:
+        """
+        Group documents into requests of at most `batch_size` chunks.
+        A document is never split: its chunks are embedded together so each
+        chunk keeps the rest of the document as context.
+        """
+        batch, batch_chunks = [], 0
+        for doc in docs_chunks:
+            if batch and batch_chunks + len(doc) > self.batch_size:
+                yield batch
+                batch, batch_chunks = [], 0
+            batch.append(doc)
+            batch_chunks += len(doc)
+        if batch:
+            yield batch
 
     def embed_document_chunks(
         self,
         docs_chunks: List[List[str]],
         *,
-        output_dimension = 1024,
-        output_dtype = "float",
+        output_dimension = None,
+        output_dtype = None,
     ) -> List[List[List[float]]]:
+        output_dimension = output_dimension or self.output_dimension
+        output_dtype = output_dtype or self.output_dtype
 
-        resp = self.client.contextualized_embed(
-            inputs=docs_chunks,
-            model=self.model,
-            input_type="document",               
-            output_dimension=output_dimension,   
-            output_dtype=output_dtype,          
-        )
-        return [r.embeddings for r in resp.results]
+        # Contextualized vectors depend on the whole document, so it is the cache unit
+        embeddings: List[Optional[List[List[float]]]] = [None] * len(docs_chunks)
+        keys = [None] * len(docs_chunks)
+        if self.cache:
+            for i, doc in enumerate(docs_chunks):
+                keys[i] = self.cache.make_key(
+                    doc, model=self.model, output_dtype=output_dtype, output_dimension=output_dimension
+                )
+                embeddings[i] = self.cache.get(keys[i])
+        missing = [i for i, doc_embeddings in enumerate(embeddings) if doc_embeddings is None]
+
+        missed_embeddings = []
+        for batch in self._batch_documents([docs_chunks[i] for i in missing]):
+            resp = self.client.contextualized_embed(
+                inputs=batch,
+                model=self.model,
+                input_type="document",
+                output_dimension=output_dimension,
+                output_dtype=output_dtype,
+            )
+            missed_embeddings.extend(r.embeddings for r in resp.results)
+
+        for i, doc_embeddings in zip(missing, missed_embeddings):
+            embeddings[i] = doc_embeddings
+            if self.cache:
+                self.cache.put(keys[i], doc_embeddings, output_dtype)
+        return embeddings
 
     def embed_query(
         self,
         query,
         *,
         output_dimension = None,
-        output_dtype: Literal["float", "int8", "uint8", "binary", "ubinary"] = "float",
+        output_dtype: Optional[Literal["float", "int8", "uint8", "binary", "ubinary"]] = None,
     ) -> List[float]:
+        return self._embed_query_cached(
+            str(query),
+            output_dimension or self.output_dimension,
+            output_dtype or self.output_dtype,
+        )
+
+    def _query_cache_key(self, query: str, output_dimension: int, output_dtype: str) -> str:
+        return self.cache.make_key(
+            [query],
+            model=self.model,
+            output_dtype=output_dtype,
+            output_dimension=output_dimension,
+            input_type="query"
+        )
+
+    def _embed_query(self, query: str, output_dimension: int, output_dtype: str) -> List[float]:
+        # Behind the in-process LRU; the persistent cache covers restarts and other sessions
+        key = None
+        if self.cache:
+            key = self._query_cache_key(query, output_dimension, output_dtype)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached[0]
         
         resp = self.client.contextualized_embed(
             inputs=[[query]],
@@ -45,4 +135,7 @@ class ContextualizedEmbeddings:
             output_dimension=output_dimension,
             output_dtype=output_dtype,
         )
-        return resp.results[0].embeddings[0]
\ No newline at end of file
+        embedding = resp.results[0].embeddings[0]
+        if self.cache:
+            self.cache.put(key, [embedding], output_dtype)
+        return embedding
@@ -1,10 +1,43 @@
 import os
-from typing import List, Dict, Any, Optional
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
+import httpx
 from src.document_processing import TensorLakeClient, RESEARCH_PAPER_SCHEMA
-from src.rag.embeddings import ContextualizedEmbeddings
-from src.rag.retriever import MilvusVectorDB
+from src.rag.embeddings import ContextualizedEmbeddings, DEFAULT_BATCH_SIZE, DEFAULT_EMBEDDING_MODEL
+from src.rag.embedding_cache import EmbeddingCache, EMBEDDING_CACHE_PATH
+from src.rag.retriever import MilvusVectorDB, Hit, DEFAULT_OUTPUT_FIELDS, MILVUS_SQ_TYPE, MILVUS_VECTOR_DTYPE
+from src.rag.semantic_cache import SemanticCache
 from src.generation import StructuredResponseGen
 
+ProgressCallback = Callable[[str, float], None]
+
+# Bounded hand-off between ingestion stages so a fast stage cannot run far ahead
+PIPELINE_QUEUE_SIZE = 4
+
+# Parse results waited on at the same time (each wait holds a worker thread)
+PARSE_CONCURRENCY = 8
+
+# Back-to-back identical retrievals are answered without touching Milvus
+RETRIEVAL_CACHE_SIZE = 256
+RETRIEVAL_CACHE_TTL = 60
+
+
+def _run_sync(coro: Coroutine) -> Any:
+    """Run a coroutine from sync code, including when an event loop is already running."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # e.g. called from a tool inside a CrewAI Flow, which runs on its own loop
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
 class RAGPipeline:
     """Unified RAG pipeline combining document parsing, embeddings, and retrieval"""
     def __init__(
@@ -13,108 +46,332 @@ class RAGPipeline:
         voyage_api_key: Optional[str] = None,
         openai_api_key: Optional[str] = None,
         milvus_db_path: str = "milvus_lite.db",
-        collection_name: str = "research_assistant"
+        collection_name: str = "research_assistant",
+        embedding_batch_size: int = DEFAULT_BATCH_SIZE,
+        embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+        index_type: str = "HNSW",
+        metric: str = "COSINE",
+        hnsw_m: int = 30,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef: int = 100,
+        sq_type: Optional[str] = MILVUS_SQ_TYPE,
+        vector_dtype: str = MILVUS_VECTOR_DTYPE,
+        semantic_cache_threshold: float = 0.95,
+        embedding_cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+        http_client: Optional[httpx.Client] = None
     ):
         self.doc_parser = TensorLakeClient(api_key=tensorlake_api_key)
-        self.embeddings = ContextualizedEmbeddings(api_key=voyage_api_key)
-        self.vector_db = MilvusVectorDB(db_path=milvus_db_path, collection_name=collection_name)
-        self.generator = StructuredResponseGen(api_key=openai_api_key)
+        self.vector_db = MilvusVectorDB(
+            db_path=milvus_db_path,
+            collection_name=collection_name,
+            index_type=index_type,
+            metric=metric,
+            hnsw_m=hnsw_m,
+            hnsw_ef_construction=hnsw_ef_construction,
+            hnsw_ef=hnsw_ef,
+            sq_type=sq_type,
+            vector_dtype=vector_dtype,
+            embedding_model=embedding_model
+        )
+        # Embed with whatever precision the vector store ended up using
+        self.embeddings = ContextualizedEmbeddings(
+            api_key=voyage_api_key,
+            model=embedding_model,
+            batch_size=embedding_batch_size,
+            output_dtype=self.vector_db.embedding_dtype,
+            cache=EmbeddingCache(embedding_cache_path) if embedding_cache_path else None
+        )
+        self.generator = StructuredResponseGen(api_key=openai_api_key, http_client=http_client)
+        self._retrieval_cache: "OrderedDict[Tuple[str, int, Tuple[str, ...]], Tuple[float, List[Hit]]]" = OrderedDict()
+        self._retrieval_lock = threading.Lock()
+        # Bumped whenever chunks are stored, so callers caching retrieval output can scope by it
+        self.index_version = 0
+        # Near-duplicate rewordings of a query reuse its hits without a Milvus search
+        self.semantic_cache = SemanticCache(
+            dim=self.embeddings.output_dimension,
+            threshold=semantic_cache_threshold,
+            max_entries=RETRIEVAL_CACHE_SIZE,
+            ttl=RETRIEVAL_CACHE_TTL
+        )
         
-    def process_documents(self, document_paths: List[str]) -> Dict[str, Any]:
+    def process_documents(
+        self,
+        document_paths: List[str],
+        progress_cb: Optional[ProgressCallback] = None,
+        doc_sigs: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        return _run_sync(self.process_documents_async(document_paths, progress_cb=progress_cb, doc_sigs=doc_sigs))
+    
+    def is_document_indexed(self, doc_sig: str) -> bool:
+        return self.vector_db.has_document(doc_sig)
+    
+    async def process_documents_async(
+        self,
+        document_paths: List[str],
+        progress_cb: Optional[ProgressCallback] = None,
+        doc_sigs: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Parse, embed and store documents as a pipeline: documents are parsed
+        concurrently while earlier ones are being embedded and inserted.
+        """
         results = {
             "processed_docs": [],
             "total_chunks": 0,
             "structured_data": []
         }
         
-        # Upload and parse documents
-        file_ids = self.doc_parser.upload(document_paths)
+        # Three stages per document; progress advances as each one starts
+        total_steps = 3 * len(document_paths)
+        steps_done = 0
+        
+        def report(stage: str) -> None:
+            nonlocal steps_done
+            if progress_cb:
+                progress_cb(stage, 0.1 + 0.9 * steps_done / total_steps)
+            steps_done += 1
+        
+        # Upload documents
+        if progress_cb:
+            progress_cb("📄 Uploading document...", 0.05)
+        file_ids = await asyncio.to_thread(self.doc_parser.upload, document_paths)
+        
+        parse_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        embed_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        
+        stages = [
+            asyncio.create_task(self._parse_stage(document_paths, file_ids, doc_sigs, parse_q, report)),
+            asyncio.create_task(self._embed_stage(parse_q, embed_q, report)),
+            asyncio.create_task(self._insert_stage(embed_q, results, report)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except Exception:
+            for stage in stages:
+                stage.cancel()
+            raise
+        finally:
+            # One flush per ingestion keeps segments large; partial inserts are persisted too
+            await asyncio.to_thread(self.vector_db.flush)
+        
+        # Documents count as indexed only once all their chunks are flushed, so a failed
+        # ingestion is retried instead of being reported as already processed
+        for doc in results["processed_docs"]:
+            if doc["doc_sig"]:
+                await asyncio.to_thread(self.vector_db.mark_document_indexed, doc["doc_sig"], doc["chunks_count"])
+        
+        if progress_cb:
+            progress_cb("✅ Document processed successfully!", 1.0)
+        return results
+    
+    async def _parse_stage(
+        self,
+        document_paths: List[str],
+        file_ids: List[str],
+        doc_sigs: Optional[List[str]],
+        parse_q: asyncio.Queue,
+        report: Callable[[str], None]
+    ) -> None:
+        doc_sigs = doc_sigs or [""] * len(document_paths)
         
-        for i, (path, file_id) in enumerate(zip(document_paths, file_ids)):
-            parse_id = self.doc_parser.parse_structured(
+        # Submit every parse first so TensorLake works on all documents at once
+        for _ in document_paths:
+            report("🔍 Parsing document content...")
+        parse_ids = await asyncio.gather(*(
+            asyncio.to_thread(
+                self.doc_parser.parse_structured,
                 file_id=file_id,
                 json_schema=RESEARCH_PAPER_SCHEMA,
-                labels={"source": path, "doc_index": i}
+                labels={"source": path, "doc_index": doc_idx}
             )
-            
-            parse_result = self.doc_parser.get_result(parse_id)
-            if parse_result is None:
-                raise Exception(f"TensorLake parsing failed for {path}: No result returned")
-            
-            # Extract chunks and structured data
-            chunks = []
-            if hasattr(parse_result, 'chunks') and parse_result.chunks:
-                for chunk in parse_result.chunks:
-                    if chunk and hasattr(chunk, 'content') and hasattr(chunk, 'page_number'):
-                        chunks.append({
-                            "page": chunk.page_number,
-                            "text": chunk.content,
-                            "source": path
-                        })
-            else:
-                raise Exception(f"TensorLake parsing failed for {path}: No chunks found in result")
-            
-            if not chunks:
-                raise Exception(f"TensorLake parsing failed for {path}: No valid chunks extracted")
+            for doc_idx, (path, file_id) in enumerate(zip(document_paths, file_ids))
+        ))
+        
+        # Then wait on the completions concurrently; each document is handed on as soon as it is ready
+        semaphore = asyncio.Semaphore(PARSE_CONCURRENCY)
+        await asyncio.gather(*(
+            self._collect_parse(path, file_id, parse_id, doc_sig, semaphore, parse_q)
+            for path, file_id, parse_id, doc_sig in zip(document_paths, file_ids, parse_ids, doc_sigs)
+        ))
+        await parse_q.put(None)
+    
+    async def _collect_parse(
+        self,
+        path: str,
+        file_id: str,
+        parse_id: str,
+        doc_sig: str,
+        semaphore: asyncio.Semaphore,
+        parse_q: asyncio.Queue
+    ) -> None:
+        async with semaphore:
+            parse_result = await asyncio.to_thread(self.doc_parser.get_result, parse_id)
+        
+        if parse_result is None:
+            raise Exception(f"TensorLake parsing failed for {path}: No result returned")
+        
+        # Extract chunks and structured data
+        if not parse_result.chunks:
+            raise Exception(f"TensorLake parsing failed for {path}: No chunks found in result")
+        
+        chunks = [
+            {
+                "page": chunk.page_number,
+                "text": chunk.content,
+                "source": path,
+                "doc_sig": doc_sig
+            }
+            for chunk in parse_result.chunks
+            if chunk is not None
+        ]
+        
+        if not chunks:
+            raise Exception(f"TensorLake parsing failed for {path}: No valid chunks extracted")
+        
+        await parse_q.put((path, file_id, parse_result, chunks))
+    
+    async def _embed_stage(
+        self,
+        parse_q: asyncio.Queue,
+        embed_q: asyncio.Queue,
+        report: Callable[[str], None]
+    ) -> None:
+        finished = False
+        while not finished and (item := await parse_q.get()) is not None:
+            # Embed every document parsed so far in a single call
+            ready = [item]
+            while not parse_q.empty():
+                item = parse_q.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                ready.append(item)
             
             # Generate contextualized embeddings
-            chunk_texts = [[chunk["text"] for chunk in chunks]]
-            embeddings_result = self.embeddings.embed_document_chunks(chunk_texts)
-            
-            if not embeddings_result or len(embeddings_result) == 0:
-                raise Exception(f"Embedding generation failed for {path}: No embeddings returned")
+            for _ in ready:
+                report("🧠 Generating embeddings...")
+            chunk_texts = [[chunk["text"] for chunk in chunks] for _, _, _, chunks in ready]
+            embeddings_result = await asyncio.to_thread(self.embeddings.embed_document_chunks, chunk_texts)
             
-            chunk_embeddings = embeddings_result[0]
+            if not embeddings_result or len(embeddings_result) != len(ready):
+                raise Exception(f"Embedding generation failed: expected {len(ready)} documents but got {len(embeddings_result) if embeddings_result else 0}")
             
-            if not chunk_embeddings or len(chunk_embeddings) != len(chunks):
-                raise Exception(f"Embedding generation failed for {path}: Chunk count mismatch - {len(chunks)} chunks but {len(chunk_embeddings) if chunk_embeddings else 0} embeddings")
+            for (path, file_id, parse_result, chunks), chunk_embeddings in zip(ready, embeddings_result):
+                if not chunk_embeddings or len(chunk_embeddings) != len(chunks):
+                    raise Exception(f"Embedding generation failed for {path}: Chunk count mismatch - {len(chunks)} chunks but {len(chunk_embeddings) if chunk_embeddings else 0} embeddings")
+                
+                await embed_q.put((path, file_id, parse_result, chunks, chunk_embeddings))
+        await embed_q.put(None)
+    
+    async def _insert_stage(
+        self,
+        embed_q: asyncio.Queue,
+        results: Dict[str, Any],
+        report: Callable[[str], None]
+    ) -> None:
+        finished = False
+        while not finished and (item := await embed_q.get()) is not None:
+            # Store every document embedded so far with a single insert
+            ready = [item]
+            while not embed_q.empty():
+                item = embed_q.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                ready.append(item)
             
-            # Prepare metadata for each chunk
-            chunk_metadata = []
-            for i, chunk in enumerate(chunks):
-                metadata = {
-                    "page_number": chunk.get("page", 0),
-                    "chunk_index": i,
-                    "source_file": chunk.get("source", path)
-                }
-                chunk_metadata.append(metadata)
+            all_texts, all_embeddings, all_metadata = [], [], []
+            for path, file_id, parse_result, chunks, chunk_embeddings in ready:
+                # Prepare metadata for each chunk
+                all_metadata.extend(
+                    {
+                        "page_number": chunk.get("page", 0),
+                        "chunk_index": chunk_idx,
+                        "source_file": chunk.get("source", path),
+                        "doc_sig": chunk.get("doc_sig", "")
+                    }
+                    for chunk_idx, chunk in enumerate(chunks)
+                )
+                all_texts.extend(chunk["text"] for chunk in chunks)
+                all_embeddings.extend(chunk_embeddings)
             
             # Store in vector database with metadata
-            self.vector_db.insert(
-                chunks=[chunk["text"] for chunk in chunks],
-                embeddings=chunk_embeddings,
-                metadata=chunk_metadata
+            for _ in ready:
+                report("💾 Storing in vector database...")
+            await asyncio.to_thread(
+                self.vector_db.insert,
+                chunks=all_texts,
+                embeddings=all_embeddings,
+                metadata=all_metadata
             )
+            # New chunks can change the top hits for any query
+            with self._retrieval_lock:
+                self._retrieval_cache.clear()
+            self.semantic_cache.clear()
+            self.index_version += 1
             
-            results["processed_docs"].append({
-                "path": path,
-                "file_id": file_id,
-                "chunks_count": len(chunks),
-                "structured_data": parse_result.model_dump()
-            })
-            results["total_chunks"] += len(chunks)
-            results["structured_data"].append(parse_result.model_dump())
-            
-        return results
+            for path, file_id, parse_result, chunks, _ in ready:
+                # Serialize once; both result fields share the same dict
+                structured_data = parse_result.model_dump()
+                results["processed_docs"].append({
+                    "path": path,
+                    "file_id": file_id,
+                    "doc_sig": chunks[0].get("doc_sig", ""),
+                    "chunks_count": len(chunks),
+                    "structured_data": structured_data
+                })
+                results["total_chunks"] += len(chunks)
+                results["structured_data"].append(structured_data)
     
-    def retrieve_context(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    def retrieve_context(
+        self,
+        query: str,
+        top_k: int = 3,
+        output_fields: Tuple[str, ...] = DEFAULT_OUTPUT_FIELDS
+    ) -> List[Hit]:
+        # Hits carry only output_fields (plus score); full chunk text must be asked for
+        key = (query, top_k, output_fields)
+        cached = self._cached_retrieval(key)
+        if cached is not None:
+            return cached
+        
         query_embedding = self.embeddings.embed_query(query)
         
-        # Search vector database
-        search_results = self.vector_db.search(
-            query_embedding=query_embedding,
-            limit=top_k
-        )
+        search_results = self.semantic_cache.get(query_embedding, scope=(top_k, output_fields))
+        if search_results is None:
+            # Search vector database
+            search_results = self.vector_db.search(
+                query_embedding=query_embedding,
+                limit=top_k,
+                output_fields=output_fields
+            )
+            self.semantic_cache.put(query_embedding, search_results, scope=(top_k, output_fields))
         
-        return search_results
+        self._store_retrieval(key, search_results)
+        return [replace(hit) for hit in search_results]
+    
+    def _cached_retrieval(self, key: Tuple[str, int, Tuple[str, ...]]) -> Optional[List[Hit]]:
+        with self._retrieval_lock:
+            cached = self._retrieval_cache.get(key)
+            if cached and time.monotonic() - cached[0] <= RETRIEVAL_CACHE_TTL:
+                self._retrieval_cache.move_to_end(key)
+                return [replace(hit) for hit in cached[1]]
+        return None
+    
+    def _store_retrieval(self, key: Tuple[str, int, Tuple[str, ...]], search_results: List[Hit]) -> None:
+        with self._retrieval_lock:
+            self._retrieval_cache[key] = (time.monotonic(), search_results)
+            self._retrieval_cache.move_to_end(key)
+            if len(self._retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+                self._retrieval_cache.popitem(last=False)
     
     def generate_response(
         self, 
         query: str, 
-        context: List[Dict[str, Any]],
+        context: List[Hit],
         source_used: str = "RAG"
     ) -> Dict[str, Any]:
-        context_blocks = [result["text"] for result in context]
+        context_blocks = [hit.text for hit in context]
         
         response = self.generator.generate(
             query=query,
@@ -125,13 +382,14 @@ class RAGPipeline:
         return response
     
     def query(self, query: str, top_k: int = 3) -> Dict[str, Any]:
-        context_results = self.retrieve_context(query, top_k=top_k)
+        # Generation only reads the chunk text and scores
+        context_results = self.retrieve_context(query, top_k=top_k, output_fields=("text",))
         response = self.generate_response(query, context_results)
         
         # Add retrieval metadata for citations
         response["retrieval_metadata"] = {
             "retrieved_chunks": len(context_results),
-            "top_scores": [r["score"] for r in context_results]
+            "top_scores": [hit.score for hit in context_results]
         }
         
         return response
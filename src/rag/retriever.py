@@ -1,66 +1,284 @@
-from typing import List, Dict, Any
+import os
+import re
+import hashlib
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
 from pymilvus import MilvusClient, DataType
 
+# Index types Milvus Lite (local file URIs) can build
+LITE_INDEX_TYPES = {"FLAT", "IVF_FLAT", "AUTOINDEX"}
+
+# Scalar quantization for HNSW_SQ; set MILVUS_SQ_TYPE="" to keep full-precision HNSW
+SQ_TYPES = {"SQ4U", "SQ6", "SQ8", "BF16", "FP16"}
+MILVUS_SQ_TYPE = os.getenv("MILVUS_SQ_TYPE", "SQ8") or None
+HNSW_SQ_MIN_VERSION = (2, 6, 8)
+INT8_VECTOR_MIN_VERSION = (2, 6)
+
+# Stored vector precision; float16 halves and int8 quarters the bytes scanned per vector
+# (int8 needs a Milvus 2.6 server). Float16 storage still takes float embeddings.
+VECTOR_DTYPES = {
+    "float": DataType.FLOAT_VECTOR,
+    "float16": DataType.FLOAT16_VECTOR,
+    "int8": DataType.INT8_VECTOR,
+}
+NUMPY_VECTOR_DTYPES = {"float16": np.float16, "int8": np.int8}
+MILVUS_VECTOR_DTYPE = os.getenv("MILVUS_VECTOR_DTYPE", "int8")
+
+# Rows per client.insert call when storing a document's chunks
+INSERT_BATCH_SIZE = 1000
+
+# Fields returned per hit; callers needing less (or the full chunk text) pass their own set
+DEFAULT_OUTPUT_FIELDS = ("page_number", "chunk_index", "source_file")
+CITATION_OUTPUT_FIELDS = DEFAULT_OUTPUT_FIELDS + ("text",)
+
+# Companion collection listing documents whose chunks were all stored and flushed;
+# Milvus requires a vector field, so its rows carry a placeholder one
+DOCUMENTS_COLLECTION_SUFFIX = "_documents"
+PLACEHOLDER_VECTOR = [1.0, 0.0]
+
+# Inserted batches between forced flushes during long ingestions; callers flush() at the end
+FLUSH_INTERVAL = 32
+
+
+@dataclass(slots=True)
+class Hit:
+    """One search result; fields not requested via output_fields keep their defaults"""
+    score: float
+    text: Optional[str] = None
+    page_number: int = 0
+    chunk_index: int = 0
+    source_file: str = "unknown"
+    doc_sig: str = ""
+
+
 class MilvusVectorDB:
-    def __init__(self, db_path: str = "milvus_lite.db", collection_name: str = "research_assistant"):
+    def __init__(
+        self,
+        db_path: str = "milvus_lite.db",
+        collection_name: str = "research_assistant",
+        index_type: str = "HNSW",
+        metric: str = "COSINE",
+        hnsw_m: int = 30,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef: int = 100,
+        sq_type: Optional[str] = MILVUS_SQ_TYPE,
+        vector_dtype: str = MILVUS_VECTOR_DTYPE,
+        embedding_model: Optional[str] = None,
+    ):
         self.client = MilvusClient(db_path)
+        # Part of the collection fingerprint: vectors from another model are not comparable
+        self.embedding_model = embedding_model
         self.collection_name = collection_name
+        self.documents_collection_name = collection_name + DOCUMENTS_COLLECTION_SUFFIX
+        self._unflushed_batches = 0
+        self.is_lite = db_path.endswith(".db")
+        self.vector_dtype = self._resolve_vector_dtype(vector_dtype.lower())
+        # Embedder output_dtype that matches the stored vectors
+        self.embedding_dtype = "int8" if self.vector_dtype == "int8" else "float"
+        self.sq_type = sq_type.upper() if sq_type else None
+        self.index_type = self._resolve_index_type(index_type.upper())
+        self.metric = metric
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef = hnsw_ef
         self._ensure_collection()
 
-    def _ensure_collection(self, dim: int = 1024):
-        if self.client.has_collection(collection_name=self.collection_name):
-            print(f"Dropping existing collection: {self.collection_name}")
-            self.client.drop_collection(collection_name=self.collection_name)
+    def _resolve_vector_dtype(self, vector_dtype: str) -> str:
+        if vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector_dtype '{vector_dtype}', expected one of {sorted(VECTOR_DTYPES)}")
+        if vector_dtype == "int8" and self.is_lite:
+            print("Milvus Lite does not support INT8_VECTOR, falling back to float vectors")
+            return "float"
+        if vector_dtype == "int8" and self._server_version() < INT8_VECTOR_MIN_VERSION:
+            print("Milvus server does not support INT8_VECTOR, falling back to float vectors")
+            return "float"
+        return vector_dtype
+
+    def _resolve_index_type(self, index_type: str) -> str:
+        if self.is_lite and index_type not in LITE_INDEX_TYPES:
+            print(f"Milvus Lite does not support {index_type}, falling back to IVF_FLAT")
+            return "IVF_FLAT"
+        if self.vector_dtype == "int8":
+            # INT8_VECTOR is only indexed by HNSW; the vectors are already quantized
+            if index_type != "HNSW":
+                print(f"INT8_VECTOR does not support {index_type}, falling back to HNSW")
+            return "HNSW"
+        if index_type == "HNSW" and self.sq_type:
+            if self.sq_type not in SQ_TYPES:
+                raise ValueError(f"Unsupported sq_type '{self.sq_type}', expected one of {sorted(SQ_TYPES)}")
+            if self._server_version() >= HNSW_SQ_MIN_VERSION:
+                return "HNSW_SQ"
+            print("Milvus server does not support HNSW_SQ, falling back to HNSW")
+        return index_type
 
+    def _server_version(self) -> Tuple[int, ...]:
+        try:
+            version = self.client.get_server_version()
+        except Exception:
+            return (0,)
+        return tuple(int(part) for part in re.findall(r"\d+", str(version))[:3])
+
+    def _index_build_params(self) -> Dict[str, Any]:
+        if self.index_type == "HNSW":
+            return {"M": self.hnsw_m, "efConstruction": self.hnsw_ef_construction}
+        if self.index_type == "HNSW_SQ":
+            return {"M": self.hnsw_m, "efConstruction": self.hnsw_ef_construction, "sq_type": self.sq_type}
+        return {}
+
+    def _index_search_params(self, limit: int, nprobe: int, ef: Optional[int] = None) -> Dict[str, Any]:
+        if self.index_type in ("HNSW", "HNSW_SQ"):
+            # ef must be at least the number of requested hits
+            return {"ef": max(ef or self.hnsw_ef, limit)}
+        return {"nprobe": nprobe}
+
+    def _ensure_collection(self, dim: int = 1024):
         schema = self.client.create_schema(
-            auto_id=True,
+            auto_id=False,
             enable_dynamic_fields=True,
+            description=self._collection_fingerprint(),
         )
-        schema.add_field("id", DataType.INT64, is_primary=True, auto_id=True)
-        schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=dim)
+        # Deterministic ids (see _row_id) make re-inserting a document an idempotent upsert
+        schema.add_field("id", DataType.INT64, is_primary=True, auto_id=False)
+        schema.add_field("embedding", VECTOR_DTYPES[self.vector_dtype], dim=dim)
         schema.add_field("text", DataType.VARCHAR, max_length=65535)
         schema.add_field("page_number", DataType.INT64)
         schema.add_field("chunk_index", DataType.INT64)
         schema.add_field("source_file", DataType.VARCHAR, max_length=500)
+        schema.add_field("doc_sig", DataType.VARCHAR, max_length=64)
+
+        # Keep stored chunks across restarts; only an incompatible schema forces a rebuild
+        if self.client.has_collection(collection_name=self.collection_name):
+            if self._schema_matches(schema):
+                self.client.load_collection(collection_name=self.collection_name)
+                self._ensure_documents_collection()
+                return
+            print(f"Dropping incompatible collection: {self.collection_name}")
+            self.client.drop_collection(collection_name=self.collection_name)
+        # Completion markers must not outlive the chunks they vouch for
+        if self.client.has_collection(collection_name=self.documents_collection_name):
+            self.client.drop_collection(collection_name=self.documents_collection_name)
 
         index_params = self.client.prepare_index_params()
-        index_params.add_index("embedding", index_type="IVF_FLAT", metric_type="COSINE")
+        index_params.add_index(
+            "embedding",
+            index_type=self.index_type,
+            metric_type=self.metric,
+            params=self._index_build_params()
+        )
 
         self.client.create_collection(
             collection_name=self.collection_name,
             schema=schema,
             index_params=index_params
         )
+        self._ensure_documents_collection()
+
+    def _ensure_documents_collection(self):
+        if self.client.has_collection(collection_name=self.documents_collection_name):
+            self.client.load_collection(collection_name=self.documents_collection_name)
+            return
+        self.client.create_collection(
+            collection_name=self.documents_collection_name,
+            dimension=len(PLACEHOLDER_VECTOR),
+            primary_field_name="doc_sig",
+            id_type="string",
+            max_length=64
+        )
+
+    def _collection_fingerprint(self) -> str:
+        """Embedding model and index settings the stored vectors were built with"""
+        settings = {
+            "embedding_model": self.embedding_model or "",
+            "index_type": self.index_type,
+            "metric": self.metric,
+            **self._index_build_params(),
+        }
+        return ";".join(f"{key}={value}" for key, value in settings.items())
+
+    def _schema_matches(self, schema) -> bool:
+        existing = self.client.describe_collection(collection_name=self.collection_name)
+        if existing.get("auto_id"):
+            return False
+        # A different embedding model or index must rebuild rather than mix with old rows
+        if existing.get("description") != schema.description:
+            return False
+        existing_fields = {(f["name"], f["type"], f.get("params", {}).get("dim")) for f in existing.get("fields", [])}
+        wanted_fields = {(f.name, f.dtype, f.params.get("dim")) for f in schema.fields}
+        return wanted_fields <= existing_fields
+
+    @staticmethod
+    def _row_id(doc_key: str, page_number: int, chunk_index: int) -> int:
+        digest = hashlib.blake2b(f"{doc_key}:{page_number}:{chunk_index}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big", signed=True)
 
     def insert(self, chunks: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]] = None):
         assert len(chunks) == len(embeddings), "Mismatch between chunks and embeddings"
         
         if metadata:
             assert len(chunks) == len(metadata), "Mismatch between chunks and metadata"
+        else:
+            metadata = [{} for _ in chunks]
 
-        data = []
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-            entry = {
+        rows = [
+            {
+                # Content signature when known, so re-uploads under a new temp path map to the same ids
+                "id": self._row_id(
+                    meta.get("doc_sig") or meta.get("source_file", "unknown"),
+                    meta.get("page_number", 0),
+                    meta.get("chunk_index", i)
+                ),
                 "text": chunk,
-                "embedding": emb,
+                "embedding": self._to_vector(emb),
+                "page_number": meta.get("page_number", 0),
+                "chunk_index": meta.get("chunk_index", i),
+                "source_file": meta.get("source_file", "unknown"),
+                "doc_sig": meta.get("doc_sig", ""),
             }
-            if metadata and i < len(metadata):
-                meta = metadata[i]
-                entry["page_number"] = meta.get("page_number", 0)
-                entry["chunk_index"] = meta.get("chunk_index", i)
-                entry["source_file"] = meta.get("source_file", "unknown")
-            else:
-                entry["page_number"] = 0
-                entry["chunk_index"] = i
-                entry["source_file"] = "unknown"
-            
-            data.append(entry)
-
-        self.client.insert(
-            collection_name=self.collection_name,
-            data=data
-        )
+            for i, (chunk, emb, meta) in enumerate(zip(chunks, embeddings, metadata))
+        ]
+
+        # Few large upserts instead of one per chunk; sealing is left to flush()
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            self.client.upsert(
+                collection_name=self.collection_name,
+                data=rows[start:start + INSERT_BATCH_SIZE]
+            )
+            self._unflushed_batches += 1
+        if self._unflushed_batches >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Seal and persist inserted rows; called once per ingestion rather than per insert"""
         self.client.flush(collection_name=self.collection_name)
+        self._unflushed_batches = 0
+
+    def _to_vector(self, embedding: List[float]) -> Any:
+        # pymilvus expects float16/int8 vectors as numpy arrays of that dtype
+        numpy_dtype = NUMPY_VECTOR_DTYPES.get(self.vector_dtype)
+        if numpy_dtype is not None:
+            return np.asarray(embedding, dtype=numpy_dtype)
+        return embedding
+
+    def mark_document_indexed(self, doc_sig: str, chunk_count: int):
+        """Record that every chunk of a document is stored; call only after flush()"""
+        self.client.upsert(
+            collection_name=self.documents_collection_name,
+            data=[{"doc_sig": doc_sig, "vector": PLACEHOLDER_VECTOR, "chunk_count": chunk_count}]
+        )
+        self.client.flush(collection_name=self.documents_collection_name)
+
+    def has_document(self, doc_sig: str) -> bool:
+        """Check whether a document content signature finished ingestion; partial ingestions do not count"""
+        if not doc_sig:
+            return False
+        rows = self.client.query(
+            collection_name=self.documents_collection_name,
+            filter=f'doc_sig == "{doc_sig}"',
+            output_fields=["doc_sig"],
+            limit=1
+        )
+        return len(rows) > 0
 
     def get_collection_count(self) -> int:
         try:
@@ -74,28 +292,30 @@ class MilvusVectorDB:
         query_embedding: List[float],
         limit: int = 3,
         nprobe: int = 10,
-        metric: str = "COSINE"
-    ) -> List[Dict[str, Any]]:
-        
-        search_params = {"metric_type": metric, "params": {"nprobe": nprobe}}
+        metric: Optional[str] = None,
+        ef: Optional[int] = None,
+        output_fields: Tuple[str, ...] = DEFAULT_OUTPUT_FIELDS
+    ) -> List[Hit]:
+        # ef overrides the collection's hnsw_ef for this query (recall vs latency)
+        # Only the requested fields are sent back; full chunk text is opt-in via "text"
+        search_params = {
+            "metric_type": metric or self.metric,
+            "params": self._index_search_params(limit, nprobe, ef)
+        }
 
         results = self.client.search(
             collection_name=self.collection_name,
-            data=[query_embedding],
+            data=[self._to_vector(query_embedding)],
             anns_field="embedding",
             search_params=search_params,
             limit=limit,
-            output_fields=["text", "page_number", "chunk_index", "source_file"],
+            output_fields=list(output_fields),
         )
 
-        hits = []
-        for hit in results[0]:
-            hits.append({
-                "text": hit.entity.get("text"),
-                "score": hit.score,
-                "page_number": hit.entity.get("page_number", 0),
-                "chunk_index": hit.entity.get("chunk_index", 0),
-                "source_file": hit.entity.get("source_file", "unknown")
-            })
-
-        return hits
\ No newline at end of file
+        return [
+            Hit(
+                score=hit.score,
+                **{field: value for field in output_fields if (value := hit.entity.get(field)) is not None}
+            )
+            for hit in results[0]
+        ]
@@ -0,0 +1,110 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Approximate cache keyed by embedding vectors.
+
+    Entries are bucketed with random-projection LSH (several tables of sign
+    bits), so a lookup only compares against the few entries sharing a bucket;
+    a hit still requires cosine similarity >= threshold. Entries expire after
+    `ttl` seconds and the least recently used one is evicted past `max_entries`.
+    """
+    def __init__(
+        self,
+        dim: int = 1024,
+        threshold: float = 0.95,
+        max_entries: int = 256,
+        ttl: Optional[float] = 600,
+        n_tables: int = 4,
+        n_bits: int = 8,
+        seed: int = 0,
+    ):
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_tables * n_bits, dim)).astype(np.float32)
+        self._n_tables = n_tables
+        self._n_bits = n_bits
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # entry id -> (inserted_at, scope, unit vector, bucket keys, value)
+        self._entries: "OrderedDict[int, Tuple[float, Hashable, np.ndarray, List[Tuple[int, int]], Any]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _unit(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if not norm:
+            return None
+        return vec / norm
+
+    def _bucket_keys(self, vec: np.ndarray) -> List[Tuple[int, int]]:
+        bits = (self._planes @ vec > 0).reshape(self._n_tables, self._n_bits)
+        codes = np.packbits(bits, axis=1, bitorder="little")
+        return [(table, int.from_bytes(code.tobytes(), "little")) for table, code in enumerate(codes)]
+
+    def get(self, embedding: Sequence[float], scope: Hashable = None) -> Optional[Any]:
+        vec = self._unit(embedding)
+        if vec is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for key in self._bucket_keys(vec):
+                candidates |= self._buckets.get(key, set())
+
+            best_id, best_sim = None, self.threshold
+            now = time.monotonic()
+            for entry_id in candidates:
+                inserted_at, entry_scope, entry_vec, _, _ = self._entries[entry_id]
+                if entry_scope != scope:
+                    continue
+                if self.ttl is not None and now - inserted_at > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                sim = float(entry_vec @ vec)
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][4]
+
+    def put(self, embedding: Sequence[float], value: Any, scope: Hashable = None) -> None:
+        vec = self._unit(embedding)
+        if vec is None:
+            return
+        keys = self._bucket_keys(vec)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (time.monotonic(), scope, vec, keys, value)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, entry_id: int) -> None:
+        _, _, _, keys, _ = self._entries.pop(entry_id)
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
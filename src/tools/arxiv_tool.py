@@ -1,10 +1,66 @@
-import json
 import requests
-import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from functools import lru_cache
+from io import BytesIO, StringIO
 from typing import Dict, Any, List, Optional, Type
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 
+from src.tools.tool_cache import TTLCache
+
+try:
+    import orjson
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    from json import dumps as json_dumps
+
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+ARXIV_NS = "{http://arxiv.org/schemas/atom}"
+
+# Clark-notation tags, built once instead of per lookup
+ENTRY_TAG = f"{ATOM_NS}entry"
+TITLE_TAG = f"{ATOM_NS}title"
+AUTHOR_TAG = f"{ATOM_NS}author"
+NAME_TAG = f"{ATOM_NS}name"
+SUMMARY_TAG = f"{ATOM_NS}summary"
+ID_TAG = f"{ATOM_NS}id"
+PUBLISHED_TAG = f"{ATOM_NS}published"
+CATEGORY_TAG = f"{ATOM_NS}category"
+PRIMARY_CATEGORY_TAG = f"{ARXIV_NS}primary_category"
+
+# Per-paper answer block, filled with format_map from the parsed paper dict
+PAPER_TEMPLATE = (
+    "**{index}. {title}**\n"
+    "Authors: {authors}\n"
+    "Category: {category}\n"
+    "Published: {published}\n"
+    "Abstract: {abstract_preview}...\n"
+    "URL: {url}"
+)
+PAPER_SEPARATOR = "\n\n---\n\n"
+
+# Evaluator retries repeat searches; ArXiv listings change slowly, so results are kept 15 minutes
+ARXIV_CACHE_SIZE = 256
+ARXIV_CACHE_TTL = 900
+_RESULT_CACHE = TTLCache(maxsize=ARXIV_CACHE_SIZE, ttl=ARXIV_CACHE_TTL)
+
+# Shared keep-alive session so repeated searches reuse the connection to export.arxiv.org
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+))
+_SESSION.headers.update({"Accept-Encoding": "gzip"})
+
 
 class ArxivAPIInput(BaseModel):
     """Input schema for ArXiv API tool"""
@@ -22,6 +78,11 @@ class ArxivTool(BaseTool):
     
     def _run(self, query: str, search_field: str = "all", category: Optional[str] = None, 
              author: Optional[str] = None, max_results: int = 5) -> str:
+        cache_key = (query, search_field, category, author, max_results)
+        cached = _RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             # Build ArXiv query
             search_query = self._build_arxiv_query(query, search_field, category, author)
@@ -37,14 +98,14 @@ class ArxivTool(BaseTool):
             }
             
             # Make API request
-            response = requests.get(base_url, params=params, timeout=30)
+            response = _SESSION.get(base_url, params=params, timeout=30)
             response.raise_for_status()
             
             # Parse XML response
             papers = self._parse_arxiv_response(response.text)
             
             if not papers:
-                return json.dumps({
+                return self._remember(cache_key, json_dumps({
                     "status": "INSUFFICIENT_CONTEXT",
                     "source_used": "ARXIV",
                     "answer": f"No papers found for query: '{query}'",
@@ -57,28 +118,22 @@ class ArxivTool(BaseTool):
                         "author": author,
                         "max_results": max_results
                     }
-                })
+                }))
 
-            answer_parts = []
-            citations = []
+            buf = StringIO()
+            buf.write(f"Found {len(papers)} relevant papers:\n\n")
             for i, paper in enumerate(papers):
-                answer_parts.append(
-                    f"**{i+1}. {paper['title']}**\n"
-                    f"Authors: {paper['authors']}\n"
-                    f"Category: {paper['category']}\n"
-                    f"Published: {paper['published']}\n"
-                    f"Abstract: {paper['abstract'][:300]}...\n"
-                    f"URL: {paper['url']}"
-                )
-                
-                citations.append({
-                    "label": f"{paper['title']} ({paper['published']})",
-                    "locator": paper['url']
-                })
+                if i:
+                    buf.write(PAPER_SEPARATOR)
+                buf.write(PAPER_TEMPLATE.format_map({**paper, "index": i + 1, "abstract_preview": paper["abstract"][:300]}))
+            answer = buf.getvalue()
             
-            answer = f"Found {len(papers)} relevant papers:\n\n" + "\n\n---\n\n".join(answer_parts)
+            citations = [
+                {"label": f"{paper['title']} ({paper['published']})", "locator": paper['url']}
+                for paper in papers
+            ]
             
-            return json.dumps({
+            return self._remember(cache_key, json_dumps({
                 "status": "OK",
                 "source_used": "ARXIV",
                 "answer": answer,
@@ -92,10 +147,10 @@ class ArxivTool(BaseTool):
                     "max_results": max_results
                 },
                 "papers_found": len(papers)
-            })
+            }))
             
         except Exception as e:
-            return json.dumps({
+            return json_dumps({
                 "status": "ERROR",
                 "source_used": "ARXIV",
                 "answer": f"ArXiv search failed: {str(e)}",
@@ -104,7 +159,15 @@ class ArxivTool(BaseTool):
                 "error": str(e)
             })
     
-    def _build_arxiv_query(self, query: str, search_field: str, category: Optional[str], author: Optional[str]) -> str:
+    @staticmethod
+    def _remember(cache_key: tuple, result: str) -> str:
+        # Only completed searches are cached; errors are retried on the next call
+        _RESULT_CACHE.put(cache_key, result)
+        return result
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _build_arxiv_query(query: str, search_field: str, category: Optional[str], author: Optional[str]) -> str:
         parts = []
         if search_field == "title":
             parts.append(f'ti:"{query}"')
@@ -126,38 +189,37 @@ class ArxivTool(BaseTool):
     
     def _parse_arxiv_response(self, xml_content: str) -> List[Dict[str, Any]]:
         try:
-            root = ET.fromstring(xml_content)
-            namespaces = {
-                'atom': 'http://www.w3.org/2005/Atom',
-                'arxiv': 'http://arxiv.org/schemas/atom'
-            }
-            
             papers = []
-            entries = root.findall('atom:entry', namespaces)
-            for entry in entries:
-                title = entry.find('atom:title', namespaces)
+            # Stream entries and release each one once read, instead of building the whole tree
+            for _, entry in ET.iterparse(BytesIO(xml_content.encode()), events=("end",)):
+                if entry.tag != ENTRY_TAG:
+                    continue
+
+                # Index the entry's children in one pass rather than a find() scan per field
+                fields = {}
+                author_elements = []
+                for child in entry:
+                    if child.tag == AUTHOR_TAG:
+                        author_elements.append(child)
+                    else:
+                        fields.setdefault(child.tag, child)
+
+                title = fields.get(TITLE_TAG)
                 title_text = title.text.strip().replace('\n', ' ') if title is not None else "No title"
                 
-                authors = []
-                author_elements = entry.findall('atom:author', namespaces)
-                for author in author_elements:
-                    name = author.find('atom:name', namespaces)
-                    if name is not None:
-                        authors.append(name.text)
+                authors = [name.text for name in (a.find(NAME_TAG) for a in author_elements) if name is not None]
                 authors_text = ", ".join(authors) if authors else "Unknown authors"
                 
-                summary = entry.find('atom:summary', namespaces)
+                summary = fields.get(SUMMARY_TAG)
                 abstract = summary.text.strip().replace('\n', ' ') if summary is not None else "No abstract"
                 
-                link = entry.find('atom:id', namespaces)
+                link = fields.get(ID_TAG)
                 url = link.text if link is not None else ""
                 
-                published = entry.find('atom:published', namespaces)
+                published = fields.get(PUBLISHED_TAG)
                 pub_date = published.text[:10] if published is not None else "Unknown date"
                 
-                category_elem = entry.find('arxiv:primary_category', namespaces)
-                if category_elem is None:
-                    category_elem = entry.find('atom:category', namespaces)
+                category_elem = fields.get(PRIMARY_CATEGORY_TAG, fields.get(CATEGORY_TAG))
                 category = category_elem.get('term') if category_elem is not None else "Unknown category"
                 
                 papers.append({
@@ -168,6 +230,7 @@ class ArxivTool(BaseTool):
                     "published": pub_date,
                     "category": category
                 })
+                entry.clear()
             
             return papers
             
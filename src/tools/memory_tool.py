@@ -1,10 +1,17 @@
-import json
-from typing import Type
-from pydantic import BaseModel, Field
+from typing import Optional, Tuple, Type
+from pydantic import BaseModel, Field, PrivateAttr
 from crewai.tools import BaseTool
 
 from src.memory import ZepMemoryLayer
 
+try:
+    import orjson
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    from json import dumps as json_dumps
+
 
 class MemoryInput(BaseModel):
     """Input schema for memory search tool"""
@@ -15,8 +22,14 @@ class MemoryTool(BaseTool):
     description: str = "Retrieve relevant information from conversation history and user preferences"
     memory_layer: ZepMemoryLayer = Field(..., description="Zep memory layer instance")
     args_schema: Type[BaseModel] = MemoryInput
+    # (memory version, serialized result); memory only changes when the layer is written to
+    _ctx_cache: Optional[Tuple[int, str]] = PrivateAttr(default=None)
     
     def _run(self, query: str) -> str:
+        version = self.memory_layer.version
+        if self._ctx_cache is not None and self._ctx_cache[0] == version:
+            return self._ctx_cache[1]
+
         try:
             context = self.memory_layer.get_context_block()
             if context:
@@ -38,10 +51,12 @@ class MemoryTool(BaseTool):
                     "context": ""
                 }
             
-            return json.dumps(result, indent=2)
+            serialized = json_dumps(result)
+            self._ctx_cache = (version, serialized)
+            return serialized
             
         except Exception as e:
-            return json.dumps({
+            return json_dumps({
                 "status": "ERROR",
                 "source_used": "MEMORY",
                 "answer": f"Memory retrieval failed: {str(e)}",
@@ -1,9 +1,21 @@
 import os
-import json
+import numpy as np
+from dataclasses import asdict
+from io import StringIO
 from typing import Dict, Any, List, Optional, Type
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 
+from src.rag.retriever import CITATION_OUTPUT_FIELDS
+
+try:
+    import orjson
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    from json import dumps as json_dumps
+
 
 class RAGInput(BaseModel):
     """Input schema for RAG search tool"""
@@ -23,7 +35,7 @@ class RAGTool(BaseTool):
             doc_count = self.rag_pipeline.vector_db.get_collection_count()
             if doc_count == 0:
                 if not document_paths:
-                    return json.dumps({
+                    return json_dumps({
                         "status": "INSUFFICIENT_CONTEXT",
                         "source_used": "RAG",
                         "answer": "No documents have been loaded into the RAG system. Please provide document_paths to load documents first, or ensure documents have been previously loaded.",
@@ -39,11 +51,11 @@ class RAGTool(BaseTool):
                 # load documents
                 load_result = self._load_documents(document_paths)
                 if load_result["status"] == "ERROR":
-                    return json.dumps(load_result, indent=2)
+                    return json_dumps(load_result)
                 
                 doc_count = self.rag_pipeline.vector_db.get_collection_count()
                 if doc_count == 0:
-                    return json.dumps({
+                    return json_dumps({
                         "status": "INSUFFICIENT_CONTEXT",
                         "source_used": "RAG",
                         "answer": "Failed to load documents into the RAG system.",
@@ -57,9 +69,10 @@ class RAGTool(BaseTool):
                     })
             
             # Retrieve relevant context (no generation)
-            context_results = self.rag_pipeline.retrieve_context(query, top_k=top_k)
+            # Citations need every field, including the full text the synthesizer grounds on
+            context_results = self.rag_pipeline.retrieve_context(query, top_k=top_k, output_fields=CITATION_OUTPUT_FIELDS)
             if not context_results:
-                return json.dumps({
+                return json_dumps({
                     "status": "INSUFFICIENT_CONTEXT",
                     "source_used": "RAG",
                     "answer": f"No relevant context found for query: '{query}'",
@@ -72,17 +85,23 @@ class RAGTool(BaseTool):
                     }
                 })
             
-            context_blocks = []
+            # Scores are collected once and reused for confidence and metadata
+            scores = np.fromiter((hit.score for hit in context_results), dtype=np.float32, count=len(context_results))
+            top_scores = scores.tolist()
+
+            buf = StringIO()
             citations = []
-            for i, result in enumerate(context_results):
-                chunk_text = result.get("text", "")
-                score = result.get("score", 0.0)
-                page_number = result.get("page_number", 0)
-                chunk_index = result.get("chunk_index", i)
-                source_file = result.get("source_file", "unknown")
+            for i, (hit, score) in enumerate(zip(context_results, top_scores)):
+                chunk_text = hit.text or ""
+                display_text = chunk_text[:500]
+                page_number = hit.page_number
+                chunk_index = hit.chunk_index
+                source_file = hit.source_file
                 
                 filename = source_file.split("/")[-1] if source_file != "unknown" else "unknown"
-                context_blocks.append(f"**Context {i+1} (Score: {score:.3f}, Page {page_number}, Chunk {chunk_index})**\n{chunk_text[:500]}...")
+                if i:
+                    buf.write("\n\n")
+                buf.write(f"**Context {i+1} (Score: {score:.3f}, Page {page_number}, Chunk {chunk_index})**\n{display_text}...")
                 citations.append({
                     "label": f"{filename} - Page {page_number}, Chunk {chunk_index}",
                     "locator": f"page_{page_number}_chunk_{chunk_index}",
@@ -93,24 +112,24 @@ class RAGTool(BaseTool):
                     "content": chunk_text
                 })
             
-            answer = "\n\n".join(context_blocks)
+            answer = buf.getvalue()
             
-            return json.dumps({
+            return json_dumps({
                 "status": "OK",
                 "source_used": "RAG",
                 "answer": f"Retrieved {len(context_results)} relevant context chunks:\n\n{answer}",
                 "citations": citations,
-                "confidence": max([r.get("score", 0.0) for r in context_results]),
+                "confidence": float(scores.max()),
                 "retrieval_metadata": {
                     "retrieved_chunks": len(context_results),
-                    "top_scores": [r.get("score", 0.0) for r in context_results],
+                    "top_scores": top_scores,
                     "document_count": doc_count
                 },
-                "raw_context": context_results  # Include raw context for further processing
+                "raw_context": [asdict(hit) for hit in context_results]  # Include raw context for further processing
             })
             
         except Exception as e:
-            return json.dumps({
+            return json_dumps({
                 "status": "ERROR",
                 "source_used": "RAG",
                 "answer": f"RAG search failed: {str(e)}",
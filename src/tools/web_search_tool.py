@@ -1,10 +1,55 @@
 import os
-import json
-from typing import Type
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Optional, Type
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 from firecrawl import Firecrawl
 
+from src.tools.tool_cache import TTLCache
+
+try:
+    import orjson
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    from json import dumps as json_dumps
+
+# Web results go stale faster than ArXiv listings, so repeated searches are kept 5 minutes
+WEB_CACHE_SIZE = 256
+WEB_CACHE_TTL = 300
+_RESULT_CACHE = TTLCache(maxsize=WEB_CACHE_SIZE, ttl=WEB_CACHE_TTL)
+
+# Characters of each result description kept in the tool output
+SNIPPET_LENGTH = 1000
+
+
+@lru_cache(maxsize=8)
+def _get_client(api_key: str) -> Firecrawl:
+    # One client per key, so searches reuse its HTTP connections instead of reconnecting
+    return Firecrawl(api_key=api_key)
+
+
+@dataclass(slots=True)
+class SearchHit:
+    title: str
+    url: str
+    content: str
+    category: Optional[str]
+
+    @classmethod
+    def from_result(cls, result: Any) -> "SearchHit":
+        content = getattr(result, "description", "") or ""
+        # Truncate content for readability
+        snippet = content[:SNIPPET_LENGTH] + "..." if len(content) > SNIPPET_LENGTH else content
+        return cls(
+            title=getattr(result, "title", "No title") or "No title",
+            url=getattr(result, "url", "") or "",
+            content=snippet or "[no description available]",
+            category=getattr(result, "category", None),
+        )
+
 class WebSearchInput(BaseModel):
     """Input schema for web search tool"""
     query: str = Field(..., description="The search query for web search.")
@@ -19,7 +64,7 @@ class FirecrawlSearchTool(BaseTool):
     def _run(self, query: str, limit: int = 3) -> str:
         try:
             if not self.api_key:
-                return json.dumps({
+                return json_dumps({
                     "status": "ERROR",
                     "source_used": "WEB",
                     "answer": "Web search unavailable - API key not configured.",
@@ -28,13 +73,17 @@ class FirecrawlSearchTool(BaseTool):
                     "error": "Missing API key"
                 })
 
-            # Initialize Firecrawl app and perform search
-            app = Firecrawl(api_key=self.api_key)
-            response = app.search(query, limit=limit)
+            cache_key = (query, limit)
+            cached = _RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                return cached
+
+            # Reuse the Firecrawl client and perform search
+            response = _get_client(self.api_key).search(query, limit=limit)
             results_list = getattr(response, "web", None)
 
             if not isinstance(results_list, list) or not results_list:
-                return json.dumps({
+                return json_dumps({
                     "status": "INSUFFICIENT_CONTEXT",
                     "source_used": "WEB",
                     "answer": "No relevant web search results found.",
@@ -43,46 +92,26 @@ class FirecrawlSearchTool(BaseTool):
                     "search_results": []
                 })
 
-            search_results = []
-            citations = []
-            for result in results_list:
-                try:
-                    title = getattr(result, "title", "No title") or "No title"
-                    url = getattr(result, "url", "") or ""
-                    content = getattr(result, "description", "") or ""
-                    category = getattr(result, "category", None)
-                    
-                    # Truncate content for readability
-                    snippet = content[:1000] + "..." if len(content) > 1000 else content
-                    if not snippet:
-                        snippet = "[no description available]"
-                    
-                    search_results.append({
-                        "title": title,
-                        "url": url,
-                        "content": snippet,
-                        "category": category
-                    })
-                    
-                    citations.append({
-                        "label": title,
-                        "locator": url
-                    })
-                    
-                except Exception as e:
-                    continue
-
-            if search_results:
-                answer_parts = []
-                for result in search_results:
-                    answer_parts.append(
-                        f"**{result['title']}**\n"
-                        f"URL: {result['url']}\n"
-                        f"Content: {result['content'][:500]}..."
-                    )
+            hits = [SearchHit.from_result(result) for result in results_list]
+            # Firecrawl can list the same page more than once; keep the first of each URL
+            seen_urls = set()
+            hits = [
+                hit for hit in hits
+                if not hit.url or (hit.url not in seen_urls and not seen_urls.add(hit.url))
+            ]
+
+            if hits:
+                answer_parts = [
+                    f"**{hit.title}**\n"
+                    f"URL: {hit.url}\n"
+                    f"Content: {hit.content[:500]}..."
+                    for hit in hits
+                ]
+                citations = [{"label": hit.title, "locator": hit.url} for hit in hits]
+                search_results = [asdict(hit) for hit in hits]
                 
                 answer = "\n\n---\n\n".join(answer_parts)
-                return json.dumps({
+                result = json_dumps({
                     "status": "OK",
                     "source_used": "WEB",
                     "answer": answer,
@@ -90,8 +119,10 @@ class FirecrawlSearchTool(BaseTool):
                     "confidence": 0.97,
                     "search_results": search_results
                 })
+                _RESULT_CACHE.put(cache_key, result)
+                return result
             else:
-                return json.dumps({
+                return json_dumps({
                     "status": "INSUFFICIENT_CONTEXT",
                     "source_used": "WEB",
                     "answer": "No relevant web search results found.",
@@ -101,7 +132,7 @@ class FirecrawlSearchTool(BaseTool):
                 })
                 
         except Exception as e:
-            return json.dumps({
+            return json_dumps({
                 "status": "ERROR",
                 "source_used": "WEB",
                 "answer": f"Web search unavailable due to technical issues: {str(e)}",
@@ -1,19 +1,144 @@
 import os
+import copy
 import json
-from typing import Dict, Any, List, Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterator, List, Optional, Set
+import httpx
 from pydantic import BaseModel, Field
-from crewai import Crew, Task
+from crewai import Crew
 from crewai.flow.flow import Flow, listen, start
 
+from src.http_client import get_http_client
 from src.rag import RAGPipeline
+from src.rag.retriever import MILVUS_SQ_TYPE, MILVUS_VECTOR_DTYPE
+from src.rag.semantic_cache import SemanticCache
 from src.memory import ZepMemoryLayer
 from .agents import Agents
-from .tasks import Tasks
+from .source_relevance import SourceRelevanceTracker
+from .tasks import Tasks, truncate_at_sentence
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# Seconds the flow waits for a context source before continuing without it. The
+# source's crew keeps running on the flow's crew pool, which the query does not wait on
+SOURCE_TIMEOUT = float(os.getenv("SOURCE_TIMEOUT", "30"))
+
+# Threads running crew kickoffs; abandoned (timed-out) runs hold theirs until they finish
+CREW_MAX_WORKERS = int(os.getenv("CREW_MAX_WORKERS", "16"))
+
+# Tighter per-source waits, so one stalled agent bounds the query's tail latency;
+# sources missing here fall back to SOURCE_TIMEOUT
+SOURCE_TIMEOUTS = {
+    "rag_result": float(os.getenv("RAG_SOURCE_TIMEOUT", "15")),
+    "memory_result": float(os.getenv("MEMORY_SOURCE_TIMEOUT", "10")),
+    "web_result": float(os.getenv("WEB_SOURCE_TIMEOUT", "20")),
+    "tool_result": float(os.getenv("ARXIV_SOURCE_TIMEOUT", "25")),
+}
+
+# Result statuses that are never cached; the next query retries the source
+FAILED_STATUSES = ("ERROR", "TIMEOUT")
+
+# Sources whose results near-duplicate queries may reuse; memory changes every turn
+CACHEABLE_SOURCES = ("rag_result", "web_result", "tool_result")
+
+# Each cacheable source has its own semantic cache, so e.g. ArXiv results survive a
+# rewording that changes the web results
+SOURCE_CACHE_THRESHOLD = 0.95
+SOURCE_CACHE_SIZE = 256
+SOURCE_CACHE_TTL = 900
+
+# Sources whose running relevance for similar queries falls below this are skipped
+SOURCE_SKIP_THRESHOLD = float(os.getenv("SOURCE_SKIP_THRESHOLD", "0.2"))
+
+# Below this many (approximate) tokens of gathered context, measured before the prompt
+# caps apply, the evaluator is skipped and the synthesizer gets every usable source
+# directly, saving an LLM round-trip
+EVALUATION_SKIP_TOKENS = int(os.getenv("EVALUATION_SKIP_TOKENS", "4000"))
+
+# Relevance recorded for sources when the evaluator is skipped: a source passed through
+# counts as neutral, one that found nothing as irrelevant
+PASS_THROUGH_RELEVANCE = 0.5
+
+# Opt-in: synthesis over every usable source starts alongside the evaluator, and its answer
+# is kept when the evaluator scores all of those sources at least SPECULATION_MIN_RELEVANCE.
+# A rejected speculation cannot be stopped (the crew runs in a worker thread), so each one
+# still pays for a full synthesis LLM call on top of the real synthesis
+SPECULATIVE_SYNTHESIS = os.getenv("SPECULATIVE_SYNTHESIS", "0") == "1"
+SPECULATION_MIN_RELEVANCE = 0.5
+
+# State fields returned to callers once the flow completes
+RESULT_FIELDS = (
+    "query",
+    "status",
+    "context_sources",
+    "raw_results",
+    "filtered_context",
+    "evaluation_result",
+    "evaluation_raw",
+    "final_response",
+    "synthesis_raw",
+)
+
+# Source names the evaluator uses in relevant_sources and filtered_context
+EVALUATOR_SOURCE_NAMES = {
+    "rag_result": "RAG",
+    "memory_result": "Memory",
+    "web_result": "Web",
+    "tool_result": "ArXiv",
+}
+
+# Task config behind each context source's crew
+SOURCE_TASKS = {
+    "rag_result": "rag_search_task",
+    "memory_result": "memory_retrieval_task",
+    "web_result": "web_search_task",
+    "tool_result": "arxiv_search_task",
+}
+
+# source_used label reported by each context source's tool
+SOURCE_LABELS = {
+    "rag_result": "RAG",
+    "memory_result": "MEMORY",
+    "web_result": "WEB",
+    "tool_result": "ARXIV",
+}
+
+
+class ResponseStream:
+    """Iterates over answer tokens; ``result`` holds the full flow output once exhausted"""
+    def __init__(self, tokens: Iterator[str], finalize: Callable[[str], Dict[str, Any]]):
+        self._tokens = tokens
+        self._finalize = finalize
+        self.result: Optional[Dict[str, Any]] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        parts = []
+        for token in self._tokens:
+            parts.append(token)
+            yield token
+        self.result = self._finalize("".join(parts))
+
 
 class ResearchAssistantState(BaseModel):
     query: str = ""
     user_id: str = "default_user"
     thread_id: str = "default_thread"
+    # Filled in step by step; each step mutates these instead of copying a growing dict
+    status: str = ""
+    context_sources: Optional[Dict[str, Any]] = None
+    raw_results: Optional[List[str]] = None
+    filtered_context: Optional[Dict[str, Any]] = None
+    # filtered_context rendered once for every synthesis prompt that uses it
+    filtered_context_str: Optional[str] = None
+    evaluation_result: Optional[Dict[str, Any]] = None
+    evaluation_raw: Optional[str] = None
+    speculative_response: Optional[str] = None
+    final_response: Optional[str] = None
+    synthesis_raw: Optional[str] = None
 
 
 class ContextEvaluationResult(BaseModel):
@@ -71,22 +196,78 @@ class ResearchAssistantFlow(Flow[ResearchAssistantState]):
         zep_api_key: Optional[str] = None,
         firecrawl_api_key: Optional[str] = None,
         milvus_db_path: str = "milvus_lite.db",
+        embedding_batch_size: int = 128,
+        index_type: str = "HNSW",
+        metric: str = "COSINE",
+        hnsw_m: int = 30,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef: int = 100,
+        sq_type: Optional[str] = MILVUS_SQ_TYPE,
+        vector_dtype: str = MILVUS_VECTOR_DTYPE,
+        rag_pipeline: Optional[RAGPipeline] = None,
+        memory_layer: Optional[ZepMemoryLayer] = None,
+        source_cache_threshold: float = SOURCE_CACHE_THRESHOLD,
+        source_cache_size: int = SOURCE_CACHE_SIZE,
+        source_skip_threshold: Optional[float] = SOURCE_SKIP_THRESHOLD,
+        evaluation_skip_tokens: int = EVALUATION_SKIP_TOKENS,
+        source_timeouts: Optional[Dict[str, float]] = None,
+        http_client: Optional[httpx.Client] = None,
     ):
         super().__init__()
         
-        self.rag_pipeline = RAGPipeline(
+        # One connection pool shared by the OpenAI and Zep clients built here
+        http_client = http_client or get_http_client()
+        
+        # Callers may share long-lived clients instead of building new ones per flow
+        self.rag_pipeline = rag_pipeline or RAGPipeline(
             tensorlake_api_key=tensorlake_api_key,
             voyage_api_key=voyage_api_key,
             openai_api_key=openai_api_key,
-            milvus_db_path=milvus_db_path
+            milvus_db_path=milvus_db_path,
+            embedding_batch_size=embedding_batch_size,
+            index_type=index_type,
+            metric=metric,
+            hnsw_m=hnsw_m,
+            hnsw_ef_construction=hnsw_ef_construction,
+            hnsw_ef=hnsw_ef,
+            sq_type=sq_type,
+            vector_dtype=vector_dtype,
+            http_client=http_client
         )
         
-        self.memory_layer = ZepMemoryLayer(
+        self.memory_layer = memory_layer or ZepMemoryLayer(
             user_id=self.state.user_id,
             thread_id=self.state.thread_id,
-            zep_api_key=zep_api_key
+            zep_api_key=zep_api_key,
+            http_client=http_client
         )
         
+        # source_key -> cache of (parsed result, raw output) for that source alone
+        self.source_caches = {
+            source_key: SemanticCache(
+                dim=self.rag_pipeline.embeddings.output_dimension,
+                threshold=source_cache_threshold,
+                max_entries=source_cache_size,
+                ttl=SOURCE_CACHE_TTL
+            )
+            for source_key in CACHEABLE_SOURCES
+        }
+        
+        # Learns from the evaluator which sources never help similar queries; None disables pruning
+        self.source_relevance = SourceRelevanceTracker(
+            dim=self.rag_pipeline.embeddings.output_dimension,
+            skip_below=source_skip_threshold
+        ) if source_skip_threshold is not None else None
+        # Cluster and skipped sources of the query in flight, read back by the evaluation step
+        self._relevance_cluster: Optional[Dict[str, Any]] = None
+        self._skipped_sources: Set[str] = set()
+        
+        self.evaluation_skip_tokens = evaluation_skip_tokens
+        self.source_timeouts = {**SOURCE_TIMEOUTS, **(source_timeouts or {})}
+        # Not asyncio's default executor: asyncio.run joins that one on exit, so a
+        # timed-out crew would still hold up the query it was abandoned by
+        self._crew_executor = ThreadPoolExecutor(max_workers=CREW_MAX_WORKERS, thread_name_prefix="crew")
+        
         # Initialize tasks and agents
         self.tasks = Tasks()
         self.agents = Agents()
@@ -98,69 +279,249 @@ class ResearchAssistantFlow(Flow[ResearchAssistantState]):
         self.tool_calling_agent = self.agents.create_arxiv_agent()
         self.evaluator_agent = self.agents.create_evaluator_agent()
         self.synthesizer_agent = self.agents.create_synthesizer_agent()
+        
+        # Template crews: each run kicks off a fresh copy() (agents and tasks included) with
+        # the query as inputs, so overlapping or abandoned runs never share Task state
+        source_agents = {
+            "rag_result": self.rag_agent,
+            "memory_result": self.memory_agent,
+            "web_result": self.web_search_agent,
+            "tool_result": self.tool_calling_agent,
+        }
+        self.source_crews = {
+            source_key: Crew(
+                agents=[agent],
+                tasks=[self.tasks.create_query_task(SOURCE_TASKS[source_key], agent)],
+                verbose=True
+            )
+            for source_key, agent in source_agents.items()
+        }
+        self.evaluation_crew = Crew(
+            agents=[self.evaluator_agent],
+            tasks=[self.tasks.create_query_task("context_evaluation_task", self.evaluator_agent, ContextEvaluationResult)],
+            verbose=True
+        )
+        self.synthesis_crew = Crew(
+            agents=[self.synthesizer_agent],
+            tasks=[self.tasks.create_query_task("synthesis_task", self.synthesizer_agent)],
+            verbose=True
+        )
     
     @start()
-    def process_query(self) -> Dict[str, Any]:
+    def process_query(self) -> None:
         query = self.state.query
         
-        # Save user query to memory
-        summarized_query = self._summarize_for_memory(query, max_length=1500)
-        self.memory_layer.save_user_message(summarized_query)
+        # The flow is reused across queries; clear what the previous one produced
+        for field in RESULT_FIELDS + ("filtered_context_str", "speculative_response"):
+            if field != "query":
+                setattr(self.state, field, ResearchAssistantState.model_fields[field].default)
+        self.state.status = "processing"
         
-        return {
-            "query": query,
-            "status": "processing"
-        }
+        # Save user query to memory without holding up retrieval
+        summarized_query = self._summarize_for_memory(query, max_length=1500)
+        self.memory_layer.save_user_message_in_background(summarized_query)
     
     @listen(process_query)
-    def gather_context_from_all_sources(self, flow_state: Dict[str, Any]) -> Dict[str, Any]:
-        query = flow_state["query"]
+    async def gather_context_from_all_sources(self) -> None:
+        query = self.state.query
         
-        # Create tasks for each agent
-        rag_task = self.tasks.create_rag_search_task(query, self.rag_agent)
+        # Memory is never cached or skipped, so its crew starts while the query is embedded
+        memory_run = asyncio.ensure_future(self._kickoff_source("memory_result", query))
         
-        memory_task = self.tasks.create_memory_retrieval_task(query, self.memory_agent)
-        web_search_task = self.tasks.create_web_search_task(query, self.web_search_agent)
-        tool_calling_task = self.tasks.create_arxiv_search_task(query, self.tool_calling_agent)
+        # A near-duplicate of a recent query reuses each RAG, web or ArXiv result its
+        # source cache still holds. Document results are scoped to the index version
+        # so new documents invalidate them
+        query_embedding = await self._embed_for_source_caches(query)
+        index_version = self.rag_pipeline.index_version
+        scopes = {"rag_result": index_version, "web_result": None, "tool_result": None}
+        cached_sources = {}
+        if query_embedding is not None:
+            for source_key in CACHEABLE_SOURCES:
+                source_hit = self.source_caches[source_key].get(query_embedding, scope=scopes[source_key])
+                if source_hit is not None:
+                    cached_sources[source_key] = copy.deepcopy(source_hit)
         
-        context_crew = Crew(
-            agents=[self.rag_agent, self.memory_agent, self.web_search_agent, self.tool_calling_agent],
-            tasks=[rag_task, memory_task, web_search_task, tool_calling_task],
-            verbose=True
+        # Sources the evaluator has kept rejecting for similar queries are not run
+        self._relevance_cluster, self._skipped_sources = None, set()
+        if self.source_relevance is not None and query_embedding is not None:
+            self._relevance_cluster = self.source_relevance.cluster(query_embedding)
+            self._skipped_sources = self.source_relevance.sources_to_skip(
+                self._relevance_cluster,
+                [SOURCE_LABELS[key] for key in CACHEABLE_SOURCES if key not in cached_sources]
+            )
+        
+        # One single-agent crew per source so the retrievals run concurrently
+        pending_sources = [
+            key for key in CACHEABLE_SOURCES
+            if key not in cached_sources and SOURCE_LABELS[key] not in self._skipped_sources
+        ]
+        outputs = await asyncio.gather(
+            memory_run,
+            *(self._kickoff_source(key, query) for key in pending_sources),
+            return_exceptions=True
         )
+        pending_sources = ["memory_result"] + pending_sources
         
-        results = context_crew.kickoff()
+        # Parse results from each agent; a failing source must not sink the others
+        fetched = {}
+        for source_key, output in zip(pending_sources, outputs):
+            if isinstance(output, Exception):
+                fetched[source_key] = (self._source_error_result(source_key, output), str(output))
+            else:
+                raw = output.tasks_output[0].raw
+                fetched[source_key] = (self._parse_agent_result(raw), raw)
         
-        # Parse results from each agent
-        context_sources = {
-            "rag_result": self._parse_agent_result(results.tasks_output[0].raw),
-            "memory_result": self._parse_agent_result(results.tasks_output[1].raw),
-            "web_result": self._parse_agent_result(results.tasks_output[2].raw),
-            "tool_result": self._parse_agent_result(results.tasks_output[3].raw)
-        }
+        if query_embedding is not None:
+            # Only fresh, successful results are stored
+            for source_key in CACHEABLE_SOURCES:
+                if source_key in fetched and fetched[source_key][0].get("status") not in FAILED_STATUSES:
+                    self.source_caches[source_key].put(
+                        query_embedding, copy.deepcopy(fetched[source_key]), scope=scopes[source_key]
+                    )
+        fetched.update(cached_sources)
+        for source_key in SOURCE_LABELS:
+            if SOURCE_LABELS[source_key] in self._skipped_sources:
+                skipped = self._source_skipped_result(source_key)
+                fetched[source_key] = (skipped, skipped["answer"])
         
-        return {
-            **flow_state,
-            "context_sources": context_sources,
-            "raw_results": [task.raw for task in results.tasks_output]
-        }
+        # Keep the fixed source order the evaluator prompt and raw_results expect
+        context_sources = {key: fetched[key][0] for key in SOURCE_LABELS}
+        raw_results = [fetched[key][1] for key in SOURCE_LABELS]
+        
+        self._attach_parsed_papers(context_sources["tool_result"])
+        
+        self.state.context_sources = context_sources
+        self.state.raw_results = raw_results
+    
+    async def _kickoff_source(self, source_key: str, query: str) -> Any:
+        # A run that times out keeps going on the crew pool without delaying the query;
+        # on its own crew copy it cannot interfere with the next run of the same source
+        return await asyncio.wait_for(
+            self._run_crew(self.source_crews[source_key], {"query": query}),
+            timeout=self.source_timeouts.get(source_key, SOURCE_TIMEOUT)
+        )
+    
+    async def _run_crew(self, crew: Crew, inputs: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._crew_executor, lambda: crew.copy().kickoff(inputs=inputs))
+    
+    async def _embed_for_source_caches(self, query: str) -> Optional[List[float]]:
+        # The source caches are an optimization; an embedding failure just means a miss
+        try:
+            return await asyncio.to_thread(self.rag_pipeline.embeddings.embed_query, query)
+        except Exception as e:
+            print(f"Source cache lookup skipped: {e}")
+            return None
     
     @listen(gather_context_from_all_sources)
-    def evaluate_context_relevance(self, flow_state: Dict[str, Any]) -> Dict[str, Any]:
-        query = flow_state["query"]
-        context_sources = flow_state["context_sources"]
+    async def evaluate_context_relevance(self) -> None:
+        await self._evaluate_context(speculate=SPECULATIVE_SYNTHESIS)
+    
+    async def _evaluate_context(self, speculate: bool) -> None:
+        query = self.state.query
+        context_sources = self.state.context_sources
         
-        evaluation_task = self.tasks.create_context_evaluation_task(
-            query, context_sources, self.evaluator_agent, ContextEvaluationResult
-        )
+        # Usable sources are rendered once, for both the size check and the speculative synthesis
+        usable = self._usable_sources(context_sources)
+        usable_str = self.tasks.render_filtered_context(usable)
+        skipped_evaluation = self._skip_evaluation(usable, usable_str)
+        if skipped_evaluation is not None:
+            self._update_state(skipped_evaluation)
+            self._record_relevance(self._pass_through_scores(context_sources))
+            return
         
-        evaluation_crew = Crew(
-            agents=[self.evaluator_agent],
-            tasks=[evaluation_task],
-            verbose=True
-        )
+        # Runs on the crew pool, so an abandoned speculation neither races a real synthesis
+        # nor holds up the asyncio.run driving this step
+        speculative = None
+        if speculate and usable:
+            speculative = asyncio.ensure_future(
+                self._run_crew(self.synthesis_crew, self.tasks.synthesis_inputs(query, filtered_context_str=usable_str))
+            )
+        
+        try:
+            evaluation_result = await self._run_crew(
+                self.evaluation_crew, self.tasks.evaluation_inputs(query, context_sources)
+            )
+        except BaseException:
+            # Only stops awaiting it; the synthesis itself finishes on the crew pool
+            if speculative is not None:
+                speculative.cancel()
+            raise
+        evaluation_fields = self._evaluation_fields(evaluation_result)
+        
+        relevance_scores = evaluation_fields["evaluation_result"].get("relevance_scores")
+        self._record_relevance(relevance_scores)
+        
+        self._update_state(evaluation_fields)
+        self.state.filtered_context_str = self.tasks.render_filtered_context(self.state.filtered_context)
+        if speculative is not None:
+            if self._keeps_all_sources(relevance_scores, usable):
+                try:
+                    self.state.speculative_response = (await speculative).tasks_output[0].raw
+                except Exception as e:
+                    print(f"Speculative synthesis failed, synthesizing again: {e}")
+            else:
+                # Result discarded; the abandoned run still completes on the crew pool
+                speculative.cancel()
+    
+    def _update_state(self, fields: Dict[str, Any]) -> None:
+        for field, value in fields.items():
+            setattr(self.state, field, value)
+    
+    def _keeps_all_sources(self, relevance_scores: Optional[Dict[str, float]], usable: Dict[str, Any]) -> bool:
+        # Evaluator labels vary in case; an unscored source counts as pruned
+        scores = {name.upper(): score for name, score in (relevance_scores or {}).items()}
+        return all(scores.get(name.upper(), 0.0) >= SPECULATION_MIN_RELEVANCE for name in usable)
+    
+    def _usable_sources(self, context_sources: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            EVALUATOR_SOURCE_NAMES[key]: source for key, source in context_sources.items()
+            if isinstance(source, dict) and source.get("status") == "OK"
+        }
+    
+    def _record_relevance(self, relevance_scores: Optional[Dict[str, float]]) -> None:
+        if self._relevance_cluster is not None and relevance_scores:
+            self.source_relevance.update(self._relevance_cluster, relevance_scores, self._skipped_sources)
+    
+    def _pass_through_scores(self, context_sources: Dict[str, Any]) -> Dict[str, float]:
+        # Failed sources say nothing about relevance and are left out
+        scores = {}
+        for key, source in context_sources.items():
+            status = source.get("status") if isinstance(source, dict) else None
+            if status == "OK":
+                scores[EVALUATOR_SOURCE_NAMES[key]] = PASS_THROUGH_RELEVANCE
+            elif status == "INSUFFICIENT_CONTEXT":
+                scores[EVALUATOR_SOURCE_NAMES[key]] = 0.0
+        return scores
+    
+    def _skip_evaluation(self, usable: Dict[str, Any], usable_str: str) -> Optional[Dict[str, Any]]:
+        """
+        With little context, filtering it is not worth an LLM call: usable sources go
+        straight to the synthesizer, which already grounds only on what is relevant.
+        Returns None when the evaluator should run.
+        """
+        # Roughly 4 characters per token of the sources as gathered; usable_str is already
+        # capped per source, so it would almost always fall under the threshold
+        gathered = {
+            name: {key: value for key, value in source.items() if key != "_parsed_papers"}
+            for name, source in usable.items()
+        }
+        if len(json.dumps(gathered, separators=(',', ':'), ensure_ascii=False, default=str)) // 4 >= self.evaluation_skip_tokens:
+            return None
         
-        evaluation_result = evaluation_crew.kickoff()
+        return {
+            "filtered_context": usable,
+            "filtered_context_str": usable_str,
+            "evaluation_result": {
+                "relevant_sources": list(usable),
+                "relevance_scores": {},
+                "reasoning": "Context was small enough to pass every source with results straight to synthesis.",
+                "evaluation_skipped": True
+            },
+            "evaluation_raw": ""
+        }
+    
+    def _evaluation_fields(self, evaluation_result: Any) -> Dict[str, Any]:
         evaluation_output = evaluation_result.tasks_output[0].pydantic
         
         if isinstance(evaluation_output, ContextEvaluationResult):
@@ -172,74 +533,174 @@ class ResearchAssistantFlow(Flow[ResearchAssistantState]):
             evaluation_data = {"raw_fallback": evaluation_result.tasks_output[0].raw}
         
         return {
-            **flow_state,
             "filtered_context": filtered_context,
             "evaluation_result": evaluation_data,
             "evaluation_raw": evaluation_result.tasks_output[0].raw
         }
     
     @listen(evaluate_context_relevance)
-    def synthesize_final_response(self, flow_state: Dict[str, Any]) -> Dict[str, Any]:
-        query = flow_state["query"]
-        filtered_context = flow_state["filtered_context"]
+    def synthesize_final_response(self) -> Dict[str, Any]:
+        # Answer already written by the speculative synthesis the evaluator accepted
+        final_response = self.state.speculative_response
+        if final_response is None:
+            synthesis_result = self.synthesis_crew.copy().kickoff(
+                inputs=self.tasks.synthesis_inputs(self.state.query, filtered_context_str=self.state.filtered_context_str)
+            )
+            final_response = synthesis_result.tasks_output[0].raw
         
-        synthesis_task = self.tasks.create_synthesis_task(
-            query, filtered_context, self.synthesizer_agent
-        )
+        return self._complete_response(final_response)
+    
+    def query_stream(
+        self,
+        query: str,
+        user_id: str,
+        thread_id: str,
+        progress_cb: Optional[Callable[[str], None]] = None
+    ) -> ResponseStream:
+        """
+        Run the flow up to synthesis, then stream the final answer token by token
+        instead of waiting for the synthesis crew to finish.
+        """
+        def report(stage: str) -> None:
+            if progress_cb:
+                progress_cb(stage)
         
-        synthesis_crew = Crew(
-            agents=[self.synthesizer_agent],
-            tasks=[synthesis_task],
-            verbose=True
+        self.state.query = query
+        self.state.user_id = user_id
+        self.state.thread_id = thread_id
+        
+        report("🧠 Saving query to memory...")
+        self.process_query()
+        report("📚 Searching documents, memory, web and papers...")
+        asyncio.run(self.gather_context_from_all_sources())
+        report("⚖️ Evaluating context relevance...")
+        # The answer is streamed below, so no speculative synthesis here
+        asyncio.run(self._evaluate_context(speculate=False))
+        report("✍️ Writing answer...")
+        
+        prompt = self.tasks.create_synthesis_prompt(query, filtered_context_str=self.state.filtered_context_str)
+        system_prompt = "\n\n".join([
+            self.synthesizer_agent.role,
+            self.synthesizer_agent.goal,
+            self.synthesizer_agent.backstory
+        ])
+        tokens = self.rag_pipeline.generator.stream_text(
+            prompt=prompt,
+            system_prompt=system_prompt,
+            llm_params=self._synthesizer_llm_params()
         )
         
-        synthesis_result = synthesis_crew.kickoff()
-        final_response = synthesis_result.tasks_output[0].raw
+        return ResponseStream(tokens, self._complete_response)
+    
+    def _synthesizer_llm_params(self) -> Dict[str, Any]:
+        # Stream with the model and temperature the synthesizer agent itself runs on,
+        # so streamed and crew-synthesized answers come from the same LLM
+        llm = self.synthesizer_agent.llm
+        model = getattr(llm, "model", None) or str(llm)
+        params: Dict[str, Any] = {"model": model.removeprefix("openai/")}
+        temperature = getattr(llm, "temperature", None)
+        if temperature is not None:
+            params["temperature"] = temperature
+        return params
+    
+    def _complete_response(self, final_response: str) -> Dict[str, Any]:
+        self._save_response_to_memory(final_response)
         
-        # Save summarized assistant response to memory
+        self.state.final_response = final_response
+        self.state.synthesis_raw = final_response
+        self.state.status = "completed"
+        # Callers get a plain dict, built once rather than copied at every step
+        return {field: getattr(self.state, field) for field in RESULT_FIELDS}
+    
+    def record_turn(self, query: str, final_response: str) -> None:
+        """Save a turn answered without running the flow (e.g. from a cache) to memory"""
+        self.memory_layer.save_user_message_in_background(self._summarize_for_memory(query, max_length=1500))
+        self._save_response_to_memory(final_response)
+    
+    def _save_response_to_memory(self, final_response: str) -> None:
+        # Save summarized assistant response to memory once the answer is returned
         summarized_response = self._summarize_for_memory(final_response)
-        self.memory_layer.save_assistant_message(summarized_response)
-        
+        self.memory_layer.save_assistant_message_in_background(summarized_response)
+    
+    def _parse_agent_result(self, raw_result: str) -> Dict[str, Any]:
+        # Prose answers are common; only attempt a parse when the text can be a JSON object.
+        # Callers read the result as a dict, so anything else falls back to prose
+        if raw_result and raw_result.lstrip()[:1] == "{":
+            try:
+                parsed = json_loads(raw_result)
+            except ValueError:
+                parsed = None
+            if isinstance(parsed, dict):
+                return parsed
         return {
-            **flow_state,
-            "final_response": final_response,
-            "synthesis_raw": final_response,
-            "status": "completed"
+            "status": "OK",
+            "source_used": "UNKNOWN",
+            "answer": raw_result,
+            "citations": [],
+            "confidence": 0.5
         }
     
-    def _parse_agent_result(self, raw_result: str) -> Dict[str, Any]:
+    def _attach_parsed_papers(self, tool_result: Dict[str, Any]) -> None:
+        """Decode a JSON ArXiv answer once so the UI can read the paper list directly"""
+        answer = tool_result.get("answer")
+        if not isinstance(answer, str):
+            return
         try:
-            return json.loads(raw_result)
+            parsed_answer = json_loads(answer)
         except json.JSONDecodeError:
-            return {
-                "status": "OK",
-                "source_used": "UNKNOWN",
-                "answer": raw_result,
-                "citations": [],
-                "confidence": 0.5
-            }
+            return
+        if isinstance(parsed_answer, dict):
+            tool_result["_parsed_papers"] = parsed_answer.get("papers", [])
+    
+    def _source_error_result(self, source_key: str, error: BaseException) -> Dict[str, Any]:
+        if isinstance(error, asyncio.TimeoutError):
+            return self._source_timeout_result(source_key)
+        return {
+            "status": "ERROR",
+            "source_used": SOURCE_LABELS.get(source_key, "UNKNOWN"),
+            "answer": f"Source retrieval failed: {str(error)}",
+            "citations": [],
+            "confidence": 0.0,
+            "error": str(error)
+        }
+    
+    def _source_timeout_result(self, source_key: str) -> Dict[str, Any]:
+        # A stalled source degrades to an empty result instead of holding up the query;
+        # its run is abandoned, not stopped
+        timeout = self.source_timeouts.get(source_key, SOURCE_TIMEOUT)
+        print(f"{SOURCE_LABELS.get(source_key, source_key)} source gave no result within {timeout:g}s; continuing without it")
+        return {
+            "status": "TIMEOUT",
+            "source_used": SOURCE_LABELS.get(source_key, "UNKNOWN"),
+            "answer": "",
+            "citations": [],
+            "confidence": 0.0
+        }
+    
+    def _source_skipped_result(self, source_key: str) -> Dict[str, Any]:
+        return {
+            "status": "INSUFFICIENT_CONTEXT",
+            "source_used": SOURCE_LABELS[source_key],
+            "answer": "Skipped: this source has not been relevant to similar queries.",
+            "citations": [],
+            "confidence": 0.0
+        }
     
     def _summarize_for_memory(self, response: str, max_length: int = 2000) -> str:
         if len(response) <= max_length:
             return response
-        
-        truncated = response[:max_length]
-        last_period = truncated.rfind('.')
-        last_exclamation = truncated.rfind('!')
-        last_question = truncated.rfind('?')
-        last_sentence_end = max(last_period, last_exclamation, last_question)
-        
-        if last_sentence_end > max_length * 0.7: 
-            return truncated[:last_sentence_end + 1] + " [Response truncated for memory storage]"
-        else:
-            last_space = truncated.rfind(' ')
-            if last_space > max_length * 0.8:
-                return truncated[:last_space] + "... [Response truncated for memory storage]"
-            else:
-                return truncated + "... [Response truncated for memory storage]"
+        return truncate_at_sentence(response, max_length) + " [Response truncated for memory storage]"
+    
+    def process_documents(
+        self,
+        document_paths: List[str],
+        progress_cb: Optional[Callable[[str, float], None]] = None,
+        doc_sigs: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        return self.rag_pipeline.process_documents(document_paths, progress_cb=progress_cb, doc_sigs=doc_sigs)
     
-    def process_documents(self, document_paths: List[str]) -> Dict[str, Any]:
-        return self.rag_pipeline.process_documents(document_paths)
+    def is_document_indexed(self, doc_sig: str) -> bool:
+        return self.rag_pipeline.is_document_indexed(doc_sig)
 
 
 def create_research_assistant_flow(**kwargs) -> ResearchAssistantFlow:
@@ -0,0 +1,55 @@
+from typing import Any, Dict, Iterable, Optional, Sequence, Set
+
+from src.rag.semantic_cache import SemanticCache
+
+
+class SourceRelevanceTracker:
+    """
+    Running (EMA) evaluator relevance score of each context source, kept per
+    cluster of similar queries. Past query embeddings live in an LSH table; a
+    query joins the most similar cluster above `cluster_threshold` or starts a
+    new one. Sources that keep scoring below `skip_below` for a cluster are
+    skipped, except on every `probe_every`-th query so they can recover.
+    """
+    def __init__(
+        self,
+        dim: int = 1024,
+        cluster_threshold: float = 0.85,
+        skip_below: float = 0.2,
+        alpha: float = 0.3,
+        min_samples: int = 3,
+        probe_every: int = 10,
+        max_clusters: int = 256,
+    ):
+        self.skip_below = skip_below
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self._clusters = SemanticCache(dim=dim, threshold=cluster_threshold, max_entries=max_clusters, ttl=None)
+
+    def cluster(self, embedding: Sequence[float]) -> Dict[str, Any]:
+        cluster = self._clusters.get(embedding)
+        if cluster is None:
+            cluster = {"queries": 0, "ema": {}, "samples": {}}
+            self._clusters.put(embedding, cluster)
+        cluster["queries"] += 1
+        return cluster
+
+    def sources_to_skip(self, cluster: Dict[str, Any], sources: Iterable[str]) -> Set[str]:
+        if cluster["queries"] % self.probe_every == 0:
+            return set()
+        return {
+            source for source in sources
+            if cluster["samples"].get(source, 0) >= self.min_samples
+            and cluster["ema"][source] < self.skip_below
+        }
+
+    def update(self, cluster: Dict[str, Any], relevance_scores: Dict[str, float], skipped: Optional[Set[str]] = None) -> None:
+        # Evaluator labels vary in case ("ArXiv", "Memory"); skipped sources were never scored
+        for source, score in relevance_scores.items():
+            source = source.upper()
+            if skipped and source in skipped:
+                continue
+            previous = cluster["ema"].get(source)
+            cluster["ema"][source] = float(score) if previous is None else previous + self.alpha * (float(score) - previous)
+            cluster["samples"][source] = cluster["samples"].get(source, 0) + 1
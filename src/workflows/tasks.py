@@ -1,74 +1,124 @@
+import re
 import json
 from crewai import Task
 from typing import Dict, Any, Optional
 
 from src.config import ConfigLoader
 
+try:
+    import orjson
+
+    def _render(obj: Any) -> str:
+        # orjson output is already compact; the prompt is read by an LLM, indentation only costs tokens
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def _render(obj: Any) -> str:
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+# Longest answer/context text passed per source to the evaluator / synthesizer prompts
+EVALUATION_SOURCE_CHARS = 2000
+SYNTHESIS_SOURCE_CHARS = 4000
+
+# Bulky fields the prompts never need; citations keep only what is needed to cite them
+PROMPT_DROP_KEYS = ("raw_context", "search_results", "_parsed_papers")
+TRUNCATED_KEYS = ("answer", "context")
+CITATION_KEYS = ("label", "locator")
+
+# Matches up to the last sentence terminator in one regex scan
+_LAST_SENTENCE_END = re.compile(r".*[.!?]", re.DOTALL)
+
+
+def truncate_at_sentence(text: str, max_length: int) -> str:
+    """Cut text to max_length, preferring a sentence end, then a word boundary"""
+    if len(text) <= max_length:
+        return text
+    
+    truncated = text[:max_length]
+    sentence = _LAST_SENTENCE_END.match(truncated)
+    if sentence and sentence.end() - 1 > max_length * 0.7:
+        return truncated[:sentence.end()]
+    last_space = truncated.rfind(' ')
+    if last_space > max_length * 0.8:
+        return truncated[:last_space] + "..."
+    return truncated + "..."
+
+
+def _compact_source(source: Any, max_chars: int) -> Any:
+    if not isinstance(source, dict):
+        return source
+    compact = {key: value for key, value in source.items() if key not in PROMPT_DROP_KEYS}
+    for key in TRUNCATED_KEYS:
+        if isinstance(compact.get(key), str):
+            compact[key] = truncate_at_sentence(compact[key], max_chars)
+    if isinstance(compact.get("citations"), list):
+        compact["citations"] = [
+            {key: citation[key] for key in CITATION_KEYS if key in citation} if isinstance(citation, dict) else citation
+            for citation in compact["citations"]
+        ]
+    return compact
+
+
+TASK_NAMES = (
+    "rag_search_task",
+    "memory_retrieval_task",
+    "web_search_task",
+    "arxiv_search_task",
+    "context_evaluation_task",
+    "synthesis_task",
+)
+
 
 class Tasks:
     def __init__(self, config_loader: Optional[ConfigLoader] = None):
         self.config_loader = config_loader or ConfigLoader()
+        # Loaded once; task creation runs several times per query
+        self._cfg = {name: self.config_loader.get_task_config(name) for name in TASK_NAMES}
     
-    def create_rag_search_task(self, query: str, agent) -> Task:
-        config = self.config_loader.get_task_config("rag_search_task")
-        return Task(
-            description=config["description"].format(query=query),
-            expected_output=config["expected_output"],
-            agent=agent
-        )
-    
-    def create_memory_retrieval_task(self, query: str, agent) -> Task:
-        config = self.config_loader.get_task_config("memory_retrieval_task")
-        return Task(
-            description=config["description"].format(query=query),
-            expected_output=config["expected_output"],
-            agent=agent
-        )
-    
-    def create_web_search_task(self, query: str, agent) -> Task:
-        config = self.config_loader.get_task_config("web_search_task")
-        return Task(
-            description=config["description"].format(query=query),
-            expected_output=config["expected_output"],
-            agent=agent
-        )
-    
-    def create_arxiv_search_task(self, query: str, agent) -> Task:
-        config = self.config_loader.get_task_config("arxiv_search_task")
-        return Task(
-            description=config["description"].format(query=query),
-            expected_output=config["expected_output"],
-            agent=agent
-        )
-    
-    def create_context_evaluation_task(self, query: str, context_sources: Dict[str, Any], agent, output_pydantic=None) -> Task:
-        config = self.config_loader.get_task_config("context_evaluation_task")
-        formatted_description = config["description"].format(
-            query=query,
-            rag_result=json.dumps(context_sources.get('rag_result', {}), indent=2),
-            memory_result=json.dumps(context_sources.get('memory_result', {}), indent=2),
-            web_result=json.dumps(context_sources.get('web_result', {}), indent=2),
-            tool_result=json.dumps(context_sources.get('tool_result', {}), indent=2)
-        )
-        
+    def create_query_task(self, task_name: str, agent, output_pydantic=None) -> Task:
+        """Task left as a template; Crew.kickoff(inputs=...) fills its placeholders with the query"""
+        config = self._cfg[task_name]
         task_kwargs = {
-            "description": formatted_description,
+            "description": config["description"],
             "expected_output": config["expected_output"],
             "agent": agent
         }
-        
         if output_pydantic:
             task_kwargs["output_pydantic"] = output_pydantic
-            
         return Task(**task_kwargs)
     
-    def create_synthesis_task(self, query: str, filtered_context: Dict[str, Any], agent) -> Task:
-        config = self.config_loader.get_task_config("synthesis_task")
-        return Task(
-            description=config["description"].format(
-                query=query,
-                filtered_context=json.dumps(filtered_context, indent=2)
-            ),
-            expected_output=config["expected_output"],
-            agent=agent
-        )
+    def evaluation_inputs(self, query: str, context_sources: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "query": query,
+            **{
+                source_key: _render(_compact_source(context_sources.get(source_key, {}), EVALUATION_SOURCE_CHARS))
+                for source_key in ("rag_result", "memory_result", "web_result", "tool_result")
+            }
+        }
+    
+    def synthesis_inputs(
+        self,
+        query: str,
+        filtered_context: Optional[Dict[str, Any]] = None,
+        filtered_context_str: Optional[str] = None
+    ) -> Dict[str, str]:
+        # A context already rendered with render_filtered_context is used as-is, keeping prompts byte-identical
+        return {
+            "query": query,
+            "filtered_context": filtered_context_str if filtered_context_str is not None else self.render_filtered_context(filtered_context)
+        }
+    
+    def create_synthesis_prompt(
+        self,
+        query: str,
+        filtered_context: Optional[Dict[str, Any]] = None,
+        filtered_context_str: Optional[str] = None
+    ) -> str:
+        config = self._cfg["synthesis_task"]
+        description = config["description"].format(**self.synthesis_inputs(query, filtered_context, filtered_context_str))
+        return f"{description}\n\nExpected output:\n{config['expected_output']}"
+    
+    def render_filtered_context(self, filtered_context: Dict[str, Any]) -> str:
+        return _render({
+            source: _compact_source(value, SYNTHESIS_SOURCE_CHARS)
+            for source, value in filtered_context.items()
+        })
\ No newline at end of file